@@ -0,0 +1,81 @@
+import json
+import time
+from collections import Counter
+
+
+COLLECTION_METHODS = {
+    "find", "find_one", "aggregate", "count_documents", "distinct",
+    "insert_one", "insert_many", "update_one", "update_many", "delete_one", "delete_many",
+    "find_one_and_delete", "find_one_and_update", "bulk_write"
+}
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self._payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+
+class FakeTelegramAPI:
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.calls = Counter()
+        self._message_id = 0
+
+    def __call__(self, method, url, params=None, files=None, **kwargs):
+        # Installed as apihelper.CUSTOM_REQUEST_SENDER, so the real request building and parsing still run
+        method_name = url.rsplit("/", 1)[1]
+        self.calls[method_name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if method_name in ("sendMessage", "editMessageReplyMarkup"):
+            self._message_id += 1
+            chat_id = int((params or {}).get("chat_id", 0))
+            result = {"message_id": self._message_id, "date": 0, "chat": {"id": chat_id, "type": "private"}}
+        else:
+            result = True
+        return FakeResponse({"ok": True, "result": result})
+
+    def total(self):
+        return sum(self.calls.values())
+
+
+class CountingCollection:
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name not in COLLECTION_METHODS:
+            return attribute
+
+        def counted(*args, **kwargs):
+            self._counter[f"{self._collection.name}.{name}"] += 1
+            return attribute(*args, **kwargs)
+
+        return counted
+
+
+class CountingDatabase:
+    def __init__(self, database):
+        self._database = database
+        self.calls = Counter()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._database, name)
+        if isinstance(attribute, type(self._database.articles)):
+            return CountingCollection(attribute, self.calls)
+        return attribute
+
+    def __getitem__(self, name):
+        return self.__getattr__(name)
+
+    def total(self):
+        return sum(self.calls.values())
@@ -0,0 +1,161 @@
+import argparse
+import random
+import statistics
+import time
+
+from telebot import TeleBot, apihelper, types
+
+from bench.fakes import CountingDatabase, FakeTelegramAPI
+from commands.article import ArticleCommands
+from commands.base import BaseCommands
+from config import user_cache, article_cache, markup_cache
+from database import DatabaseManager
+from services.prefix_index import PrefixIndex
+from services.stats import ArticleStats
+from services.sync_io import SyncBot, SyncDatabase, run_sync
+
+SCENARIOS = ("list", "search", "random", "article", "saved_page", "result_page")
+
+
+def seed(db, users, articles, saved_per_user):
+    db.articles.insert_many([
+        {
+            "name": f"article{index:07d}",
+            "content": f"Benchmark article number {index}. " * 8,
+            "author": 0,
+            "created_at": "2024-01-01",
+            "updated_at": None
+        }
+        for index in range(articles)
+    ])
+    saved = list(db.articles.find({}, {"name": 1}))
+    db.users.insert_many([
+        {
+            "uid": uid,
+            "moderator": False,
+            "language": random.choice(("en", "ru")),
+            "saved_articles": random.sample(saved, min(saved_per_user, len(saved)))
+        }
+        for uid in range(1, users + 1)
+    ])
+    return [str(article["_id"]) for article in saved]
+
+
+class UpdateFactory:
+    def __init__(self, users, article_ids, articles):
+        self.users = users
+        self.article_ids = article_ids
+        self.articles = articles
+        self.update_id = 0
+        self.result_pages = []
+
+    def make(self, scenario):
+        uid = random.randint(1, self.users)
+        if scenario == "list":
+            return self._message(uid, "/list")
+        if scenario == "search":
+            return self._message(uid, f"/search article{random.randrange(self.articles) // 100:05d}")
+        if scenario == "random":
+            return self._message(uid, "/random")
+        if scenario == "article":
+            return self._callback(uid, f"article_{random.choice(self.article_ids)}")
+        if scenario == "saved_page":
+            return self._callback(uid, f"saved_{random.choice((10, 20))}")
+        if scenario == "result_page" and self.result_pages:
+            return self._callback(uid, random.choice(self.result_pages))
+        return self._message(uid, "/random")
+
+    def _message(self, uid, text):
+        self.update_id += 1
+        command_length = len(text.split(" ")[0])
+        return types.Update.de_json({
+            "update_id": self.update_id,
+            "message": {
+                "message_id": self.update_id,
+                "date": 0,
+                "chat": {"id": uid, "type": "private"},
+                "from": {"id": uid, "is_bot": False, "first_name": "bench"},
+                "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": command_length}]
+            }
+        })
+
+    def _callback(self, uid, data):
+        self.update_id += 1
+        return types.Update.de_json({
+            "update_id": self.update_id,
+            "callback_query": {
+                "id": str(self.update_id),
+                "chat_instance": "bench",
+                "data": data,
+                "from": {"id": uid, "is_bot": False, "first_name": "bench"},
+                "message": {"message_id": 1, "date": 0, "chat": {"id": uid, "type": "private"}, "text": "bench"}
+            }
+        })
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay synthetic updates against the handlers with fake Telegram and Mongo")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--articles", type=int, default=10000)
+    parser.add_argument("--saved", type=int, default=30, help="Saved articles per user")
+    parser.add_argument("--updates", type=int, default=500, help="Updates per scenario")
+    parser.add_argument("--api-latency-ms", type=float, default=0, help="Simulated Bot API round trip")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    for cache in (user_cache, article_cache, markup_cache):
+        cache.clear()
+
+    database = CountingDatabase(DatabaseManager(backend="memory").db)
+    article_ids = seed(database, args.users, args.articles, args.saved)
+    database.calls.clear()
+
+    api = FakeTelegramAPI(args.api_latency_ms / 1000)
+    apihelper.CUSTOM_REQUEST_SENDER = api
+    bot = TeleBot("0:bench", threaded=False)
+    handler_bot, handler_db = SyncBot(bot), SyncDatabase(database)
+    BaseCommands(handler_bot, handler_db).register_commands()
+    # The stats thread is not started, views stay pending in memory like between two flushes
+    article_commands = ArticleCommands(
+        handler_bot, handler_db, PrefixIndex(database), ArticleStats(database, 0, 0, 0), text_index=False
+    )
+    article_commands.register_commands()
+
+    factory = UpdateFactory(args.users, article_ids, args.articles)
+    if "result_page" in args.scenarios:
+        # Result set cursors only exist once /random has stored some
+        for _ in range(20):
+            articles = run_sync(article_commands._get_random_articles(30))
+            factory.result_pages.append(f"page_{run_sync(article_commands.result_sets.create(articles))}_10")
+
+    print(f"{'scenario':<12} {'updates':>8} {'p50 ms':>9} {'p99 ms':>9} {'db/update':>10} {'api/update':>11}")
+    for scenario in args.scenarios:
+        updates = [factory.make(scenario) for _ in range(args.updates)]
+        latencies = []
+        db_calls = database.total()
+        api_calls = api.total()
+        for update in updates:
+            started_at = time.perf_counter()
+            bot.process_new_updates([update])
+            latencies.append((time.perf_counter() - started_at) * 1000)
+
+        print(
+            f"{scenario:<12} {len(updates):>8} {statistics.median(latencies):>9.3f} {percentile(latencies, 0.99):>9.3f}"
+            f" {(database.total() - db_calls) / len(updates):>10.2f} {(api.total() - api_calls) / len(updates):>11.2f}"
+        )
+
+    print()
+    for name, cache in (("users", user_cache), ("articles", article_cache), ("markups", markup_cache)):
+        print(f"{name} cache: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
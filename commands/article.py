@@ -1,17 +1,37 @@
-import random
+import json
 
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
 from pymongo.errors import DuplicateKeyError
 from telebot import types
 from datetime import datetime
 
-from config import check_user_registered, check_user_mod_status, parse_command_args
+from config import (
+    check_user_registered, check_user_mod_status, parse_command_args,
+    user_cache, article_cache, markup_cache, catalog, RESULT_SET_TTL, MAX_ARTICLE_LENGTH
+)
+from services.pagination import ResultSetStore
+from services.revisions import RevisionStore
+from services.search import ArticleSearch
+
+PAGE_SIZE = 10
+SEARCH_LIMIT = 100
+RANDOM_LIMIT = PAGE_SIZE
+INLINE_LIMIT = 20
+INLINE_CACHE_TIME = 30
 
 
 class ArticleCommands:
-    def __init__(self, bot, db):
+    def __init__(self, bot, db, prefix_index, stats, text_index=True):
         self.bot = bot
         self.db = db
+        self.search_engine = ArticleSearch(db, text_index)
+        self.result_sets = ResultSetStore(db, RESULT_SET_TTL)
+        self.revisions = RevisionStore(db)
+        # Both are kept in memory and talk to Mongo from their own threads, so they are built outside
+        self.prefix_index = prefix_index
+        self.stats = stats
 
     def register_commands(self):
         self.bot.message_handler(commands=['save'])(self.save_command)
@@ -19,295 +39,498 @@ class ArticleCommands:
         self.bot.message_handler(commands=['list'])(self.list_command)
         self.bot.message_handler(commands=['search'])(self.search_command)
         self.bot.message_handler(commands=['random'])(self.random_command)
+        self.bot.message_handler(commands=['top'])(self.top_command)
         self.bot.callback_query_handler(func=lambda call: call.data.startswith("article_"))(
             self.article_callback_handler)
-        self.bot.callback_query_handler(
-            func=lambda call: call.data.startswith("saved_next_") or call.data.startswith("saved_prev_"))(
+        self.bot.callback_query_handler(func=lambda call: call.data.startswith("saved_"))(
             self.pagination_callback_handler)
+        self.bot.callback_query_handler(func=lambda call: call.data.startswith("page_"))(
+            self.result_set_callback_handler)
         self.bot.message_handler(commands=['create'])(self.create_command)
         self.bot.message_handler(commands=['edit'])(self.edit_command)
         self.bot.message_handler(commands=['delete'])(self.delete_command)
-
-    def save_command(self, message):
-        user = check_user_registered(self.bot, self.db, message)
+        self.bot.message_handler(commands=['history'])(self.history_command)
+        self.bot.callback_query_handler(func=lambda call: call.data.startswith("history_"))(
+            self.history_callback_handler)
+        self.bot.callback_query_handler(func=lambda call: call.data.startswith("revision_"))(
+            self.revision_callback_handler)
+        self.bot.inline_handler(func=lambda inline_query: True)(self.inline_query_handler)
+
+    async def save_command(self, message):
+        user = await check_user_registered(self.bot, self.db, message)
         if not user:
             return
 
         name, _ = parse_command_args(message)
-        if not name or not self._check_article_exists(name, message):
+        if not name:
+            return
+
+        article = await self._find_article(name, message)
+        if not article:
             return
 
-        if name in user["saved_articles"]:
-            reply_text = {
-                "en": f"Article *{name}* is already in your saved list.",
-                "ru": f"Статья *{name}* уже в избранных."
-            }
-            self.bot.reply_to(message, reply_text[user['language']], parse_mode="Markdown")
+        if self._is_saved(user, name):
+            await self.bot.reply_to(message, catalog.get("article_already_saved", user["language"], name=name), parse_mode="Markdown")
             return
 
-        self._update_user_articles(user["uid"], name, "add")
-        reply_text = {
-            "en": f"Article *{name}* has been saved to your list.",
-            "ru": f"Статья *{name}* добавлена в избранное."
-        }
-        self.bot.reply_to(message, reply_text[user["language"]], parse_mode="Markdown")
+        await self._update_user_articles(user["uid"], article, "add")
+        self.stats.record_save(article["_id"])
+        await self.bot.reply_to(message, catalog.get("article_saved", user["language"], name=name), parse_mode="Markdown")
 
-    def remove_command(self, message):
-        user = check_user_registered(self.bot, self.db, message)
+    async def remove_command(self, message):
+        user = await check_user_registered(self.bot, self.db, message)
         if not user:
             return
 
         name, _ = parse_command_args(message)
-        if not name or not self._check_article_exists(name, message):
+        if not name:
             return
 
-        if name not in user["saved_articles"]:
-            reply_text = {
-                "en": f"Article *{name}* is not in your list.",
-                "ru": f"Статья *{name}* отсутствует в ваших избранных."
-            }
-            self.bot.reply_to(message, reply_text[user["language"]], parse_mode="Markdown")
+        if not self._is_saved(user, name):
+            await self.bot.reply_to(message, catalog.get("article_not_in_list", user["language"], name=name), parse_mode="Markdown")
             return
 
-        self._update_user_articles(user["uid"], name, "remove")
-        reply_text = {
-            "en": f"Article *{name}* has been removed from your list.",
-            "ru": f"Статья *{name}* удалена из вашего избранных."
-        }
-        self.bot.reply_to(message, reply_text[user["language"]], parse_mode="Markdown")
+        await self._update_user_articles(user["uid"], {"name": name}, "remove")
+        await self.bot.reply_to(message, catalog.get("article_removed", user["language"], name=name), parse_mode="Markdown")
 
-    def list_command(self, message):
-        user = check_user_registered(self.bot, self.db, message)
+    async def list_command(self, message):
+        user = await check_user_registered(self.bot, self.db, message)
         if not user:
             return
 
-        articles = self._get_user_articles(user)
-        markup = self._build_articles_markup(articles, 0)
+        articles, has_next = self._get_user_articles(user, 0)
+        markup = self._build_articles_markup(articles, "saved", 0, has_next)
 
-        reply_text = {
-            "en": "Your saved articles list:",
-            "ru": "Ваши избранные статьи:"
-        }
+        await self.bot.reply_to(message, catalog.get("saved_articles", user["language"]), reply_markup=markup)
 
-        self.bot.reply_to(message, reply_text[user["language"]], reply_markup=markup)
+    async def search_command(self, message):
+        user = await check_user_registered(self.bot, self.db, message)
+        if not user:
+            return
 
-    def search_command(self, message):
-        user = check_user_registered(self.bot, self.db, message)
+        query = self._get_search_query(message.text)
+        if not query:
+            await self.bot.reply_to(message, catalog.get("search_usage", user["language"]))
+            return
+
+        articles, _ = await self.search_engine.search(query, 0, SEARCH_LIMIT)
+        if not articles:
+            await self.bot.reply_to(message, catalog.get("search_no_results", user["language"], query=query), parse_mode="Markdown")
+            return
+
+        markup = await self._build_result_set_markup(articles)
+        await self.bot.reply_to(message, catalog.get("search_results", user["language"], query=query), reply_markup=markup, parse_mode="Markdown")
+
+    async def random_command(self, message):
+        user = await check_user_registered(self.bot, self.db, message)
         if not user:
             return
 
-        query = message.text.split(" ")[1]
-        articles = list(self.db.articles.find({"name": {"$regex": query, "$options": "i"}}))
+        articles = await self._get_random_articles(RANDOM_LIMIT)
         if not articles:
-            reply_text = {
-                "en": f"No articles found matching *{query}*.",
-                "ru": f"Статьи, соответствующие *{query}*, не найдены."
-            }
-            self.bot.reply_to(message, reply_text[user["language"]], parse_mode="Markdown")
+            await self.bot.reply_to(message, catalog.get("no_articles", user["language"]))
             return
 
-        markup = self._build_articles_markup(articles, 0)
-        reply_text = {
-            "en": f"Search results for *{query}*:",
-            "ru": f"Результаты поиска по запросу *{query}*:"
-        }
+        markup = await self._build_result_set_markup(articles)
+        await self.bot.reply_to(message, catalog.get("random_articles", user["language"]), reply_markup=markup, parse_mode="Markdown")
 
-        self.bot.reply_to(message, reply_text[user['language']], reply_markup=markup, parse_mode="Markdown")
+    async def top_command(self, message):
+        user = await check_user_registered(self.bot, self.db, message)
+        if not user:
+            return
 
-    def random_command(self, message):
-        user = check_user_registered(self.bot, self.db, message)
-        articles = list(self.db.articles.find())
-        articles = random.sample(articles, 10)
-        markup = self._build_articles_markup(articles, 0)
-        reply_text = {
-            "en": "Random articles:",
-            "ru": "Подборка случайных статей:"
-        }
-        self.bot.reply_to(message, text=reply_text[user["language"]], reply_markup=markup, parse_mode="Markdown")
+        # Served from the leaderboard the stats thread refreshes, never from a query on the request path
+        articles = self.stats.leaderboard
+        if not articles:
+            await self.bot.reply_to(message, catalog.get("top_empty", user["language"]))
+            return
 
-    def article_callback_handler(self, call):
-        user = check_user_registered(self.bot, self.db, call)
-        article_id = call.data.split("_")[1]
-        article = self.db.articles.find_one({"_id": ObjectId(article_id)})
+        markup = self._build_articles_markup(articles, None, 0, False)
+        await self.bot.reply_to(message, catalog.get("top_articles", user["language"]), reply_markup=markup)
 
-        extra_text = {
-            "en": f"Created at: {article['created_at']}",
-            "ru": f"Создано: {article['created_at']}"
-        }
+    async def article_callback_handler(self, call):
+        user = await check_user_registered(self.bot, self.db, call)
+        if not user:
+            return
+
+        cursor = self._parse_cursor(call.data, ObjectId)
+        article = await self._get_article(str(cursor[0])) if cursor else None
+        if not article:
+            await self.bot.answer_callback_query(call.id)
+            return
+        self.stats.record_view(article["_id"])
+
+        extra_text = catalog.get("article_created_at", user["language"], date=article["created_at"])
         if article["updated_at"]:
-            extra_text = {
-                "en": f"Update at: {article['created_at']}",
-                "ru": f"Обновлено: {article['created_at']}"
-            }
+            extra_text = catalog.get("article_updated_at", user["language"], date=article["updated_at"])
 
-        self.bot.send_message(
-            chat_id=call.message.chat.id,
-            text=f"*{article['name']}*\n\n{article['content']}\n\n{extra_text[user['language']]}",
+        # Buttons on messages sent through inline mode come back without a message, answer in the private chat
+        await self.bot.send_message(
+            chat_id=call.message.chat.id if call.message else call.from_user.id,
+            text=f"{article['text']}\n\n{extra_text}",
             parse_mode="Markdown"
         )
 
-    def pagination_callback_handler(self, call):
-        data_parts = call.data.split("_")
-        page = int(data_parts[2])
-        user = check_user_registered(self.bot, self.db, call)
+    async def pagination_callback_handler(self, call):
+        offset = self._get_saved_offset(call.data)
+        if offset is None:
+            await self.bot.answer_callback_query(call.id)
+            return
+
+        user = await check_user_registered(self.bot, self.db, call)
+        if not user:
+            return
+
+        articles, has_next = self._get_user_articles(user, offset)
+        markup = self._build_articles_markup(articles, "saved", offset, has_next)
+
+        await self.bot.edit_message_reply_markup(
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+            reply_markup=markup
+        )
+
+    async def result_set_callback_handler(self, call):
+        cursor = self._parse_cursor(call.data, ObjectId, _offset)
+        if cursor is None:
+            await self.bot.answer_callback_query(call.id)
+            return
+
+        result_set_id, offset = str(cursor[0]), cursor[1]
+        user = await check_user_registered(self.bot, self.db, call)
         if not user:
             return
 
-        articles = self._get_user_articles(user)
-        markup = self._build_articles_markup(articles, page)
+        articles, has_next = await self.result_sets.get_page(result_set_id, offset, PAGE_SIZE)
+        if articles is None:
+            await self.bot.answer_callback_query(call.id, catalog.get("results_expired", user["language"]))
+            return
+
+        markup = self._build_articles_markup(articles, f"page_{result_set_id}", offset, has_next)
 
-        self.bot.edit_message_reply_markup(
+        await self.bot.edit_message_reply_markup(
             chat_id=call.message.chat.id,
             message_id=call.message.message_id,
             reply_markup=markup
         )
 
-    def create_command(self, message):
-        user = check_user_registered(self.bot, self.db, message)
-        if not user or not check_user_mod_status(self.bot, user, message):
+    async def create_command(self, message):
+        user = await check_user_registered(self.bot, self.db, message)
+        if not user or not await check_user_mod_status(self.bot, user, message):
             return
 
         name, content = parse_command_args(message)
         if not name or not content:
-            reply_text = {
-                "en": "Usage: /create <name> <content>",
-                "ru": "Использование: /create <название> <контент>."
-            }
-            self.bot.reply_to(message, reply_text[user["language"]])
+            await self.bot.reply_to(message, catalog.get("create_usage", user["language"]))
             return
 
-        if len(content) > 768:
-            reply_text = {
-                "en": "Maximum article length is 768 symbols.",
-                "ru": "Максимальная длинна статьи 768 символов."
-            }
-            self.bot.reply_to(message, reply_text[user["language"]])
+        if len(content) > MAX_ARTICLE_LENGTH:
+            await self.bot.reply_to(message, catalog.get("article_too_long", user["language"], limit=MAX_ARTICLE_LENGTH))
             return
 
         try:
-            self.db.articles.insert_one({
+            result = await self.db.articles.insert_one({
                 "name": name,
                 "content": content,
                 "author": message.from_user.id,
                 "created_at": datetime.now().date().isoformat(),
-                "updated_at": None
+                "updated_at": None,
+                "revision": 0
             })
-            reply_text = {
-                "en": f"Article *{name}* has been created.",
-                "ru": f"Статья *{name}* создана."
-            }
-            self.bot.reply_to(message, reply_text[user["language"]], parse_mode="Markdown")
+            article_cache.invalidate(name)
+            self.prefix_index.add(name, str(result.inserted_id))
+            await self.bot.reply_to(message, catalog.get("article_created", user["language"], name=name), parse_mode="Markdown")
         except DuplicateKeyError:
-            reply_text = {
-                "en": f"An article with the name *{name}* already exists.",
-                "ru": f"Статья с названием *{name}* уже существует."
-            }
-            self.bot.reply_to(message, reply_text[user["language"]], parse_mode="Markdown")
+            await self.bot.reply_to(message, catalog.get("article_exists", user["language"], name=name), parse_mode="Markdown")
 
-    def edit_command(self, message):
-        user = check_user_registered(self.bot, self.db, message)
-        if not user or not check_user_mod_status(self.bot, user, message):
+    async def edit_command(self, message):
+        user = await check_user_registered(self.bot, self.db, message)
+        if not user or not await check_user_mod_status(self.bot, user, message):
             return
 
         name, content = parse_command_args(message)
         if not name or not content:
-            reply_text = {
-                "en": "Usage: /edit <name> <content>",
-                "ru": "Использование: /edit <название> <контент>."
-            }
-            self.bot.reply_to(message, reply_text[user["language"]])
+            await self.bot.reply_to(message, catalog.get("edit_usage", user["language"]))
             return
 
-        if len(content) > 768:
-            reply_text = {
-                "en": "Maximum article length is 768 symbols.",
-                "ru": "Максимальная длинна статьи 768 символов."
-            }
-            self.bot.reply_to(message, reply_text[user["language"]])
+        if len(content) > MAX_ARTICLE_LENGTH:
+            await self.bot.reply_to(message, catalog.get("article_too_long", user["language"], limit=MAX_ARTICLE_LENGTH))
             return
 
-        self.db.articles.update_one({"name": name}, {"$set": {"content": content, "updated_at": datetime.now().date().isoformat()}})
+        edited_at = datetime.now().date().isoformat()
+        previous = await self.db.articles.find_one_and_update(
+            {"name": name},
+            {"$set": {"content": content, "updated_at": edited_at}, "$inc": {"revision": 1}},
+            {"content": 1, "revision": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if not previous:
+            await self.bot.reply_to(message, catalog.get("article_not_found", user["language"], name=name), parse_mode="Markdown")
+            return
 
-        reply_text = {
-            "en": f"Article *{name}* has been updated.",
-            "ru": f"Статья *{name}* обновлена."
-        }
-        self.bot.reply_to(message, reply_text[user['language']], parse_mode="Markdown")
+        await self.revisions.record(
+            previous["_id"], previous.get("revision", 0) + 1, previous["content"], content, message.from_user.id, edited_at
+        )
+        article_cache.invalidate(name)
+
+        await self.bot.reply_to(message, catalog.get("article_updated", user["language"], name=name), parse_mode="Markdown")
 
-    def delete_command(self, message):
-        user = check_user_registered(self.bot, self.db, message)
-        if not user or not check_user_mod_status(self.bot, user, message):
+    async def delete_command(self, message):
+        user = await check_user_registered(self.bot, self.db, message)
+        if not user or not await check_user_mod_status(self.bot, user, message):
             return
 
         name, _ = parse_command_args(message)
         if not name:
-            reply_text = {
-                "en": "Usage: /delete <name>",
-                "ru": "Использование: /delete <название>."
-            }
-            self.bot.reply_to(message, reply_text[user["language"]])
+            await self.bot.reply_to(message, catalog.get("delete_usage", user["language"]))
             return
 
-        res = self.db.articles.delete_one({"name": name})
+        article = await self.db.articles.find_one_and_delete({"name": name}, {"_id": 1})
+        article_cache.invalidate(name)
 
-        if res.deleted_count == 0:
-            reply_text = {
-                "en": f"Article *{name}* not found.",
-                "ru": f"Статья *{name}* не найдена."
-            }
-            self.bot.reply_to(message, reply_text[user['language']], parse_mode="Markdown")
+        if not article:
+            await self.bot.reply_to(message, catalog.get("article_not_found", user["language"], name=name), parse_mode="Markdown")
             return
 
-        self.db.users.update_many({"saved_articles": name}, {"$pull": {"saved_articles": name}})
+        self.prefix_index.remove(name)
 
-        reply_text = {
-            "en": f"Article *{name}* has been deleted.",
-            "ru": f"Статья *{name}* удалена."
-        }
-        self.bot.reply_to(message, reply_text[user['language']], parse_mode="Markdown")
+        # The multikey index on saved_articles._id limits this to the users that saved the article
+        affected_uids = await self.db.users.distinct("uid", {"saved_articles._id": article["_id"]})
+        if affected_uids:
+            await self.db.users.update_many(
+                {"saved_articles._id": article["_id"]},
+                {"$pull": {"saved_articles": {"_id": article["_id"]}}}
+            )
+        user_cache.invalidate_many(affected_uids)
+        markup_cache.invalidate(str(article["_id"]))
+        await self.revisions.delete([article["_id"]])
+
+        await self.bot.reply_to(message, catalog.get("article_deleted", user["language"], name=name), parse_mode="Markdown")
 
-    def _check_article_exists(self, name, message):
-        article = self.db.articles.find_one({"name": name})
+    async def history_command(self, message):
+        user = await check_user_registered(self.bot, self.db, message)
+        if not user:
+            return
+
+        name, _ = parse_command_args(message)
+        if not name:
+            await self.bot.reply_to(message, catalog.get("history_usage", user["language"]))
+            return
+
+        article = await self._find_article(name, message)
+        if not article:
+            return
+
+        revisions, has_next = await self.revisions.get_page(article["_id"], 0, PAGE_SIZE)
+        if not revisions:
+            await self.bot.reply_to(message, catalog.get("history_empty", user["language"], name=name), parse_mode="Markdown")
+            return
+
+        markup = self._build_history_markup(article["_id"], revisions, 0, has_next)
+        await self.bot.reply_to(message, catalog.get("history", user["language"], name=name), reply_markup=markup, parse_mode="Markdown")
+
+    async def history_callback_handler(self, call):
+        cursor = self._parse_cursor(call.data, ObjectId, _offset)
+        if cursor is None:
+            await self.bot.answer_callback_query(call.id)
+            return
+
+        article_id, offset = cursor
+        user = await check_user_registered(self.bot, self.db, call)
+        if not user:
+            return
+
+        revisions, has_next = await self.revisions.get_page(article_id, offset, PAGE_SIZE)
+        markup = self._build_history_markup(article_id, revisions, offset, has_next)
+
+        await self.bot.edit_message_reply_markup(
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+            reply_markup=markup
+        )
+
+    async def revision_callback_handler(self, call):
+        cursor = self._parse_cursor(call.data, ObjectId, _offset)
+        if cursor is None:
+            await self.bot.answer_callback_query(call.id)
+            return
+
+        article_id, number = cursor
+        user = await check_user_registered(self.bot, self.db, call)
+        if not user:
+            return
+
+        article = await self.db.articles.find_one({"_id": article_id}, {"name": 1, "content": 1})
+        content = await self.revisions.get_content(article, number) if article else None
+        if content is None:
+            await self.bot.answer_callback_query(call.id, catalog.get("results_expired", user["language"]))
+            return
+
+        await self.bot.send_message(
+            chat_id=call.message.chat.id,
+            text=f"{catalog.get('revision', user['language'], name=article['name'], number=number)}\n\n{content}",
+            parse_mode="Markdown"
+        )
+
+    async def inline_query_handler(self, inline_query):
+        prefix = inline_query.query.strip()
+        matches = self.prefix_index.search(prefix, INLINE_LIMIT) if prefix else []
+        open_text = catalog.get("open_article", inline_query.from_user.language_code)
+
+        results = []
+        for name, article_id in matches:
+            markup = types.InlineKeyboardMarkup()
+            markup.add(types.InlineKeyboardButton(text=open_text, callback_data=f"article_{article_id}"))
+            results.append(types.InlineQueryResultArticle(
+                id=article_id,
+                title=name,
+                input_message_content=types.InputTextMessageContent(f"*{name}*", parse_mode="Markdown"),
+                reply_markup=markup
+            ))
+
+        await self.bot.answer_inline_query(inline_query.id, results, cache_time=INLINE_CACHE_TIME)
+
+    async def _find_article(self, name, message):
+        cached = article_cache.get_by_name(name)
+        if cached:
+            return {"_id": ObjectId(cached["_id"]), "name": name}
+
+        article = await self.db.articles.find_one({"name": name}, {"name": 1})
         if not article:
-            self.bot.reply_to(message, f"Article *{name}* not found. / Статья *{name}* не найдена.",
-                              parse_mode="Markdown")
-            return False
-        return True
+            await self.bot.reply_to(message, catalog.get_all("article_not_found", name=name), parse_mode="Markdown")
+            return None
+        return article
+
+    async def _get_article(self, article_id):
+        article = article_cache.get(article_id)
+        if article:
+            return article
+
+        document = await self.db.articles.find_one({"_id": ObjectId(article_id)})
+        if not document:
+            return None
+
+        article = {
+            "_id": article_id,
+            "name": document["name"],
+            "text": f"*{document['name']}*\n\n{document['content']}",
+            "created_at": document["created_at"],
+            "updated_at": document["updated_at"]
+        }
+        article_cache.set(article)
+        return article
 
-    def _update_user_articles(self, user_id, name, action):
+    async def _update_user_articles(self, user_id, article, action):
         if action == "add":
-            self.db.users.update_one({"uid": user_id}, {"$push": {"saved_articles": name}})
+            saved = {"_id": article["_id"], "name": article["name"]}
+            await self.db.users.update_one({"uid": user_id}, {"$push": {"saved_articles": saved}})
         elif action == "remove":
-            self.db.users.update_one({"uid": user_id}, {"$pull": {"saved_articles": name}})
+            await self.db.users.update_one({"uid": user_id}, {"$pull": {"saved_articles": {"name": article["name"]}}})
+        user_cache.invalidate(user_id)
+
+    async def _get_random_articles(self, size):
+        # $sample picks documents inside Mongo and returns every document when the collection is smaller than size.
+        # It may pick a document twice, $group leaves each one once. A single page needs no stored result set.
+        cursor = await self.db.articles.aggregate([
+            {"$sample": {"size": size}},
+            {"$group": {"_id": "$_id", "name": {"$first": "$name"}}}
+        ])
+        return await cursor.to_list()
+
+    @staticmethod
+    def _get_user_articles(user, offset):
+        # Saved entries carry the article id and name, so a page renders straight from the user document
+        return user["saved_articles"][offset:offset + PAGE_SIZE], offset + PAGE_SIZE < len(user["saved_articles"])
+
+    @classmethod
+    def _get_saved_offset(cls, data):
+        # Buttons sent before offsets were used still read saved_next_<page> and saved_prev_<page>
+        legacy = cls._parse_cursor(data, _direction, _offset)
+        if legacy:
+            return legacy[1] * PAGE_SIZE
+        cursor = cls._parse_cursor(data, _offset)
+        return cursor[0] if cursor else None
+
+    @staticmethod
+    def _parse_cursor(data, *fields):
+        # Callback data is <prefix>_<field>_..., any client can send whatever it likes there. None means the
+        # handler answers quietly and does nothing.
+        parts = data.split("_")[1:]
+        if len(parts) != len(fields):
+            return None
+        try:
+            return [convert(part) for convert, part in zip(fields, parts)]
+        except (InvalidId, TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _is_saved(user, name):
+        return any(saved["name"] == name for saved in user["saved_articles"])
 
-    def _get_user_articles(self, user):
-        articles = []
-        for article_name in user["saved_articles"]:
-            article = self.db.articles.find_one({"name": article_name})
-            if article:
-                articles.append(article)
-        return articles
+    @staticmethod
+    def _get_search_query(text):
+        return text.partition(" ")[2].strip()
+
+    async def _build_result_set_markup(self, articles):
+        # Single page results need no server-side state, longer ones are paged through a stored result set
+        if len(articles) <= PAGE_SIZE:
+            return self._build_articles_markup(articles, None, 0, False)
+
+        result_set_id = await self.result_sets.create(articles)
+        return self._build_articles_markup(articles[:PAGE_SIZE], f"page_{result_set_id}", 0, True)
 
     @staticmethod
-    def _build_articles_markup(articles, page):
+    def _build_history_markup(article_id, revisions, offset, has_next):
         markup = types.InlineKeyboardMarkup()
-        start_index = page * 10
-        end_index = start_index + 10
-        page_articles = articles[start_index:end_index]
-
-        for article in page_articles:
-            article_button = types.InlineKeyboardButton(
-                text=article["name"],
-                callback_data=f"article_{article['_id']}"
-            )
-            markup.add(article_button)
 
-        if end_index < len(articles):
-            next_page_button = types.InlineKeyboardButton(text=">", callback_data=f"saved_next_{page + 1}")
-            markup.add(next_page_button)
+        for revision in revisions:
+            markup.add(types.InlineKeyboardButton(
+                text=f"#{revision['number']} {revision['edited_at']} +{revision['added']} -{revision['removed']}",
+                callback_data=f"revision_{article_id}_{revision['number']}"
+            ))
 
-        if page > 0:
-            previous_page_button = types.InlineKeyboardButton(text="<", callback_data=f"saved_prev_{page - 1}")
-            markup.add(previous_page_button)
+        if has_next:
+            markup.add(types.InlineKeyboardButton(text=">", callback_data=f"history_{article_id}_{offset + PAGE_SIZE}"))
+
+        if offset > 0:
+            markup.add(types.InlineKeyboardButton(text="<", callback_data=f"history_{article_id}_{offset - PAGE_SIZE}"))
 
         return markup
+
+    @staticmethod
+    def _build_articles_markup(articles, cursor_prefix, offset, has_next):
+        # Article rows only depend on the ordered ids, so saved lists and result sets showing the same page share
+        # their serialized JSON. Navigation carries the cursor, which may hold a one-off result set id, and is
+        # serialized for every message.
+        article_ids = tuple(str(article["_id"]) for article in articles)
+        rows = markup_cache.get(article_ids)
+        if rows is None:
+            rows = ", ".join(
+                json.dumps([{"text": article["name"], "callback_data": f"article_{article['_id']}"}])
+                for article in articles
+            )
+            markup_cache.set(article_ids, article_ids, rows)
+
+        # Callback data is <cursor_prefix>_<offset> and must fit in Telegram's 64 bytes
+        navigation = []
+        if has_next:
+            navigation.append([{"text": ">", "callback_data": f"{cursor_prefix}_{offset + PAGE_SIZE}"}])
+        if offset > 0:
+            navigation.append([{"text": "<", "callback_data": f"{cursor_prefix}_{offset - PAGE_SIZE}"}])
+
+        keyboard = [rows] if rows else []
+        keyboard += [json.dumps(row) for row in navigation]
+        return '{"inline_keyboard": [' + ", ".join(keyboard) + ']}'
+
+
+def _offset(value):
+    offset = int(value)
+    if offset < 0:
+        raise ValueError(value)
+    return offset
+
+
+def _direction(value):
+    if value not in ("next", "prev"):
+        raise ValueError(value)
+    return value
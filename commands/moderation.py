@@ -1,4 +1,4 @@
-from config import check_user_registered, check_user_mod_status, parse_command_args
+from config import check_user_registered, check_user_mod_status, parse_command_args, user_cache, catalog
 
 class ModCommands:
     def __init__(self, bot, db):
@@ -9,26 +9,35 @@ class ModCommands:
         self.bot.message_handler(commands=["mod"])(self.add_moderator_command)
         self.bot.message_handler(commands=["unmod"])(self.remove_moderator_command)
 
-    def add_moderator_command(self, message):
-        user = check_user_registered(self.bot, self.db, message)
-        if not user or not check_user_mod_status(self.bot, user, message):
+    async def add_moderator_command(self, message):
+        user = await check_user_registered(self.bot, self.db, message)
+        if not user or not await check_user_mod_status(self.bot, user, message):
             return
 
         user_id, _ = parse_command_args(message)
-        self._update_user_mod_status(user_id, "add")
-        self.bot.reply_to(message, "Successfully added moderator status to user")
+        if not user_id or not user_id.isdigit():
+            await self.bot.reply_to(message, catalog.get("mod_usage", user["language"]))
+            return
+
+        await self._update_user_mod_status(int(user_id), "add")
+        await self.bot.reply_to(message, catalog.get("moderator_added", user["language"]))
 
-    def remove_moderator_command(self, message):
-        user = check_user_registered(self.bot, self.db, message)
-        if not user or not check_user_mod_status(self.bot, user, message):
+    async def remove_moderator_command(self, message):
+        user = await check_user_registered(self.bot, self.db, message)
+        if not user or not await check_user_mod_status(self.bot, user, message):
             return
 
         user_id, _ = parse_command_args(message)
-        self._update_user_mod_status(user_id, "remove")
-        self.bot.reply_to(message, "Successfully removed moderator status to user")
+        if not user_id or not user_id.isdigit():
+            await self.bot.reply_to(message, catalog.get("unmod_usage", user["language"]))
+            return
+
+        await self._update_user_mod_status(int(user_id), "remove")
+        await self.bot.reply_to(message, catalog.get("moderator_removed", user["language"]))
 
-    def _update_user_mod_status(self, user_id, action):
+    async def _update_user_mod_status(self, user_id, action):
         if action == "add":
-            self.db.users.update_one({"uid": user_id}, {"$set": {"moderator": True}})
+            await self.db.users.update_one({"uid": user_id}, {"$set": {"moderator": True}})
         elif action == "remove":
-            self.db.users.update_one({"uid": user_id}, {"$set": {"moderator": False}})
+            await self.db.users.update_one({"uid": user_id}, {"$set": {"moderator": False}})
+        user_cache.invalidate(user_id)
@@ -1,31 +1,93 @@
 import os
 from dotenv import load_dotenv
+from telebot import types
+
+from services.cache import ArticleCache, LRUCache, MarkupCache
+from services.i18n import MessageCatalog
+from services.metrics import MetricsRegistry, register_default_metrics, register_cache_metrics
 
 load_dotenv()
 
 TOKEN = os.getenv("BOT_TOKEN")
 
 MONGO_DB_URI = os.getenv("MONGO_DB_URI")
+MONGO_BACKEND = os.getenv("MONGO_BACKEND", "mongo")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", 5000))
+
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", 4))
+BOT_QUEUE_SIZE = int(os.getenv("BOT_QUEUE_SIZE", 100))
+
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", 1))
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", 5))
+THROTTLE_MAX_USERS = int(os.getenv("THROTTLE_MAX_USERS", 100000))
+DEDUP_WINDOW = float(os.getenv("DEDUP_WINDOW", 2))
+
+OUTBOX_SENDERS = int(os.getenv("OUTBOX_SENDERS", 4))
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", 30))
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", 1))
+OUTBOX_CHAT_BURST = int(os.getenv("OUTBOX_CHAT_BURST", 3))
+OUTBOX_MAX_RETRIES = int(os.getenv("OUTBOX_MAX_RETRIES", 5))
+
+CLUSTER_ROLE = os.getenv("CLUSTER_ROLE", "worker")
+CLUSTER_SHARDS = int(os.getenv("CLUSTER_SHARDS", 1))
+CLUSTER_SHARD = int(os.getenv("CLUSTER_SHARD", 0))
+
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+SLOW_UPDATE_MS = int(os.getenv("SLOW_UPDATE_MS", 0))
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8443))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 300))
+ARTICLE_CACHE_SIZE = int(os.getenv("ARTICLE_CACHE_SIZE", 1000))
+ARTICLE_CACHE_TTL = int(os.getenv("ARTICLE_CACHE_TTL", 600))
+MARKUP_CACHE_SIZE = int(os.getenv("MARKUP_CACHE_SIZE", 5000))
+RESULT_SET_TTL = int(os.getenv("RESULT_SET_TTL", 3600))
+
+STATS_FLUSH_INTERVAL = int(os.getenv("STATS_FLUSH_INTERVAL", 10))
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", 10))
+LEADERBOARD_INTERVAL = int(os.getenv("LEADERBOARD_INTERVAL", 300))
+
+MAX_ARTICLE_LENGTH = 768
+
+user_cache = LRUCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+article_cache = ArticleCache(ARTICLE_CACHE_SIZE, ARTICLE_CACHE_TTL)
+markup_cache = MarkupCache(MARKUP_CACHE_SIZE)
+
+catalog = MessageCatalog()
+
+metrics = MetricsRegistry()
+register_default_metrics(metrics)
+register_cache_metrics(metrics, {"users": user_cache, "articles": article_cache, "markups": markup_cache})
 
 
-def check_user_registered(bot, db, obj):
+async def check_user_registered(bot, db, obj):
     user_id = obj.from_user.id if hasattr(obj, 'from_user') else obj.message.from_user.id
-    user = db.users.find_one({"uid": user_id})
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"uid": user_id})
+        if user:
+            user_cache.set(user_id, user)
     if not user:
-        bot.reply_to(
-            obj,
-            "You need to start the bot first using /start. / Для начала воспользуйтесь командой /start."
-        )
+        # Inline results carry buttons into any chat, so unregistered users tap them too
+        if isinstance(obj, types.CallbackQuery):
+            await bot.answer_callback_query(obj.id, catalog.get_all("not_registered"), show_alert=True)
+        else:
+            await bot.reply_to(obj, catalog.get_all("not_registered"))
         return None
     return user
 
 
-def check_user_mod_status(bot, user, message):
+async def check_user_mod_status(bot, user, message):
     if not user["moderator"]:
-        bot.reply_to(
-            message,
-            "You should be moderator to use this command! / Вы должны быть модератором чтобы использовать эту команду!"
-        )
+        await bot.reply_to(message, catalog.get("moderator_required", user["language"]))
         return False
     return True
 
@@ -1,31 +1,218 @@
 # database.py
 
+import threading
+
+from pymongo import AsyncMongoClient, TEXT, UpdateOne
+from pymongo.errors import CollectionInvalid
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
-from config import MONGO_DB_URI
+from config import MONGO_DB_URI, MONGO_BACKEND, MONGO_MAX_POOL_SIZE, MONGO_TIMEOUT_MS, metrics
+from services.metrics import MongoCommandListener
+from services.sync_io import SyncDatabase
+
+
+# Names create_index gives the indexes of _init_indexes, checked by every bot process on startup
+EXPECTED_INDEXES = {
+    'users': ['uid_1', 'saved_articles._id_1'],
+    'articles': ['name_1', 'articles_text', 'views_-1_saves_-1'],
+    'article_revisions': ['article_id_1_number_1'],
+    'result_sets': ['expires_at_1'],
+    'update_queue': ['shard_1__id_1']
+}
 
 
 class DatabaseManager:
-    def __init__(self):
-        self.client = MongoClient(MONGO_DB_URI, server_api=ServerApi('1'))
-        self.db = self.client['WikiDatabase']
+    def __init__(self, uri=MONGO_DB_URI, backend=MONGO_BACKEND, max_pool_size=MONGO_MAX_POOL_SIZE,
+                 timeout_ms=MONGO_TIMEOUT_MS):
+        self.uri = uri
+        self.backend = backend
+        self.max_pool_size = max_pool_size
+        self.timeout_ms = timeout_ms
+        self._client = None
+        self._db = None
+        self._async_client = None
+        self._async_db = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        self._connect()
+        return self._client
+
+    @property
+    def db(self):
+        self._connect()
+        return self._db
+
+    @property
+    def async_db(self):
+        # Only the handlers of BOT_MODE=async use it, background threads keep the blocking client
+        if self._async_db is None:
+            if self.backend == "memory":
+                # mongomock answers from memory, blocking the event loop for that is harmless
+                self._async_db = SyncDatabase(self.db)
+            else:
+                self._async_client = AsyncMongoClient(
+                    self.uri,
+                    server_api=ServerApi('1'),
+                    maxPoolSize=self.max_pool_size,
+                    serverSelectionTimeoutMS=self.timeout_ms,
+                    connectTimeoutMS=self.timeout_ms,
+                    event_listeners=[MongoCommandListener(metrics)]
+                )
+                self._async_db = self._async_client['WikiDatabase']
+        return self._async_db
+
+    def _connect(self):
+        if self._db is not None:
+            return
+
+        with self._lock:
+            if self._db is not None:
+                return
+
+            if self.backend == "memory":
+                import mongomock
+
+                _accept_bulk_sort(mongomock)
+                self._client = mongomock.MongoClient()
+                self._db = self._client['WikiDatabase']
+                # A fresh in-memory database has no schema yet
+                self.migrate()
+            else:
+                self._client = MongoClient(
+                    self.uri,
+                    server_api=ServerApi('1'),
+                    maxPoolSize=self.max_pool_size,
+                    serverSelectionTimeoutMS=self.timeout_ms,
+                    connectTimeoutMS=self.timeout_ms,
+                    event_listeners=[MongoCommandListener(metrics)]
+                )
+                self._db = self._client['WikiDatabase']
+
+    def migrate(self):
+        self._connect()
         self._init_collections()
         self._init_indexes()
+        self._migrate_saved_articles()
+
+    def missing_schema(self):
+        # A read-only check, one listIndexes per collection, creating anything is left to manage.py migrate
+        self._connect()
+        missing = []
+        if 'cache_events' not in self._db.list_collection_names(filter={'name': 'cache_events'}):
+            missing.append('cache_events')
+        for collection, names in EXPECTED_INDEXES.items():
+            existing = self._db[collection].index_information()
+            missing += [f"{collection}.{name}" for name in names if name not in existing]
+        return missing
 
     def _init_collections(self):
-        if 'users' not in self.db.list_collection_names():
-            self.db.create_collection('users')
+        existing = self._db.list_collection_names()
+        if 'users' not in existing:
+            self._create_collection('users')
+
+        if 'articles' not in existing:
+            self._create_collection('articles')
 
-        if 'articles' not in self.db.list_collection_names():
-            self.db.create_collection('articles')
+        if 'cache_events' not in existing:
+            if self.backend == "memory":
+                # mongomock has no capped collections, the in-memory backend never runs as a cluster anyway
+                self._create_collection('cache_events')
+            else:
+                self._create_collection('cache_events', capped=True, size=16 * 1024 * 1024)
 
+    def _create_collection(self, name, **options):
+        # Two migrate runs may overlap, another one may have just created it
+        try:
+            self._db.create_collection(name, **options)
+        except CollectionInvalid:
+            pass
 
     def _init_indexes(self):
-        self.db.users.create_index('uid', unique=True)
-        self.db.articles.create_index('name', unique=True)
+        self._db.users.create_index('uid', unique=True)
+        self._db.users.create_index('saved_articles._id')
+        self._db.articles.create_index('name', unique=True)
+        self._db.articles.create_index(
+            [('name', TEXT), ('content', TEXT)],
+            weights={'name': 10, 'content': 1},
+            default_language='none',
+            name='articles_text'
+        )
+        self._db.articles.create_index([('views', -1), ('saves', -1)])
+        self._db.article_revisions.create_index([('article_id', 1), ('number', 1)], unique=True)
+        self._db.result_sets.create_index('expires_at', expireAfterSeconds=0)
+        self._db.update_queue.create_index([('shard', 1), ('_id', 1)])
+
+    def _migrate_saved_articles(self, batch_size=1000):
+        # saved_articles used to hold plain article names, they become {_id, name} entries
+        batch = []
+        for user in self._db.users.find({"saved_articles": {"$type": "string"}}, {"saved_articles": 1}):
+            batch.append(user)
+            if len(batch) >= batch_size:
+                self._convert_saved_articles(batch)
+                batch = []
+        if batch:
+            self._convert_saved_articles(batch)
+
+    def _convert_saved_articles(self, users):
+        names = {entry for user in users for entry in user["saved_articles"] if isinstance(entry, str)}
+        ids_by_name = {
+            article["name"]: article["_id"]
+            for article in self._db.articles.find({"name": {"$in": list(names)}}, {"name": 1})
+        }
+
+        requests = []
+        for user in users:
+            saved_articles = []
+            for entry in user["saved_articles"]:
+                if not isinstance(entry, str):
+                    saved_articles.append(entry)
+                elif entry in ids_by_name:
+                    saved_articles.append({"_id": ids_by_name[entry], "name": entry})
+            requests.append(UpdateOne({"_id": user["_id"]}, {"$set": {"saved_articles": saved_articles}}))
+        self._db.users.bulk_write(requests, ordered=False)
 
     def close(self):
-        self.client.close()
+        if self._client is not None:
+            self._client.close()
+
+    async def close_async(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+
+
+def _accept_bulk_sort(mongomock):
+    # pymongo 4.11 passes UpdateOne's and ReplaceOne's sort to the bulk builder, which mongomock 4.3 predates.
+    # Without this every bulk_write of them raises TypeError on the in-memory backend. The bulk paths never sort.
+    builder = mongomock.collection.BulkOperationBuilder
+    if getattr(builder, "_accepts_sort", False):
+        return
+
+    def drop_sort(method):
+        def call(self, *args, sort=None, **kwargs):
+            if sort:
+                raise NotImplementedError("mongomock has no sorted bulk updates")
+            return method(self, *args, **kwargs)
+
+        return call
+
+    builder.add_update = drop_sort(builder.add_update)
+    builder.add_replace = drop_sort(builder.add_replace)
+    builder._accepts_sort = True
+
+
+class LazyDatabase:
+    # Stands in for the pymongo Database so importing this module never touches the network
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __getattr__(self, name):
+        return getattr(self._manager.db, name)
+
+    def __getitem__(self, name):
+        return self._manager.db[name]
+
 
 db_manager = DatabaseManager()
-db = db_manager.db
\ No newline at end of file
+db = LazyDatabase(db_manager)
@@ -1,18 +1,120 @@
-from config import TOKEN
-from database import db
+import asyncio
+import os
+import socket
+import sys
+
+from config import (
+    TOKEN, MONGO_BACKEND, BOT_MODE, BOT_WORKERS, BOT_QUEUE_SIZE,
+    THROTTLE_RATE, THROTTLE_BURST, THROTTLE_MAX_USERS, DEDUP_WINDOW,
+    OUTBOX_SENDERS, OUTBOX_GLOBAL_RATE, OUTBOX_CHAT_RATE, OUTBOX_CHAT_BURST, OUTBOX_MAX_RETRIES,
+    WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+    METRICS_HOST, METRICS_PORT, SLOW_UPDATE_MS, CLUSTER_ROLE, CLUSTER_SHARDS, CLUSTER_SHARD,
+    STATS_FLUSH_INTERVAL, LEADERBOARD_SIZE, LEADERBOARD_INTERVAL,
+    metrics, catalog, user_cache, article_cache, markup_cache
+)
+from database import db, db_manager
 from commands.base import BaseCommands
 from commands.article import ArticleCommands
+from commands.moderation import ModCommands
+from services.async_runtime import FilteringAsyncTeleBot
+from services.cluster import UpdateQueue, CacheEventFeed, run_ingest
+from services.dispatch import DispatchingTeleBot
+from services.metrics import instrument_handlers, start_metrics_server
+from services.outbox import Outbox
+from services.prefix_index import PrefixIndex
+from services.stats import ArticleStats
+from services.sync_io import SyncBot, SyncDatabase
+from services.throttle import UpdateFilter
+from services.webhook import WebhookServer
+
+update_filter = UpdateFilter(
+    THROTTLE_RATE, THROTTLE_BURST, DEDUP_WINDOW, THROTTLE_MAX_USERS, metrics=metrics, catalog=catalog
+)
+
+if BOT_MODE == "async":
+    # The handlers are coroutines in every mode, here they run on the loop against AsyncMongoClient
+    bot = FilteringAsyncTeleBot(TOKEN, update_filter=update_filter)
+    handler_bot, handler_db = bot, db_manager.async_db
+else:
+    bot = DispatchingTeleBot(TOKEN, BOT_WORKERS, BOT_QUEUE_SIZE, update_filter=update_filter)
 
-from telebot import TeleBot
+    outbox = Outbox(
+        OUTBOX_SENDERS, OUTBOX_GLOBAL_RATE, OUTBOX_CHAT_RATE, OUTBOX_CHAT_BURST, OUTBOX_MAX_RETRIES, metrics=metrics
+    )
+    outbox.install(bot)
+    outbox.start()
 
-bot = TeleBot(TOKEN)
+    # ...and here each one is driven to completion on a dispatcher thread with the blocking clients
+    handler_bot, handler_db = SyncBot(bot), SyncDatabase(db)
 
-base_commands = BaseCommands(bot, db)
+# Kept in memory and refreshed from background threads, which always use the blocking client
+prefix_index = PrefixIndex(db)
+stats = ArticleStats(db, STATS_FLUSH_INTERVAL, LEADERBOARD_SIZE, LEADERBOARD_INTERVAL)
+
+base_commands = BaseCommands(handler_bot, handler_db)
 base_commands.register_commands()
 
-article_commands = ArticleCommands(bot, db)
+article_commands = ArticleCommands(
+    handler_bot, handler_db, prefix_index, stats, text_index=MONGO_BACKEND != "memory"
+)
 article_commands.register_commands()
 
+mod_commands = ModCommands(handler_bot, handler_db)
+mod_commands.register_commands()
+
+instrument_handlers(bot, metrics, SLOW_UPDATE_MS)
+
+
+async def run_async():
+    try:
+        await bot.infinity_polling()
+    finally:
+        await bot.close_session()
+        await db_manager.close_async()
+
 
 if __name__ == "__main__":
-    bot.infinity_polling()
\ No newline at end of file
+    if METRICS_PORT:
+        start_metrics_server(metrics, METRICS_HOST, METRICS_PORT)
+
+    if BOT_MODE != "cluster" or CLUSTER_ROLE == "worker":
+        # Schema changes run once through manage.py migrate, a bot process only refuses to start without them
+        missing = db_manager.missing_schema()
+        if missing:
+            sys.exit(f"Missing collections or indexes: {', '.join(missing)}. Run manage.py migrate first.")
+        prefix_index.build()
+        stats.start()
+
+        # Follows invalidations from manage.py and, in cluster mode, from the other workers.
+        # Only cluster workers publish their own, a single bot process has nobody to tell.
+        if MONGO_BACKEND != "memory":
+            feed = CacheEventFeed(
+                db,
+                {
+                    "users": user_cache,
+                    "articles": article_cache,
+                    "markups": markup_cache,
+                    "prefix_index": prefix_index
+                },
+                f"{socket.gethostname()}:{os.getpid()}"
+            )
+            if BOT_MODE == "cluster":
+                feed.attach()
+            feed.start()
+
+    if BOT_MODE == "cluster":
+        # One ingest process polls Telegram, CLUSTER_SHARDS worker processes each consume one shard
+        update_queue = UpdateQueue(db, CLUSTER_SHARDS)
+        if CLUSTER_ROLE == "ingest":
+            run_ingest(TOKEN, update_queue)
+        else:
+            update_queue.consume(CLUSTER_SHARD, bot)
+    elif BOT_MODE == "webhook":
+        # Without WEBHOOK_URL the server only takes local POSTs, e.g. recorded update JSON sent with curl
+        if WEBHOOK_URL:
+            bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
+        WebhookServer(bot, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET).serve_forever()
+    elif BOT_MODE == "async":
+        asyncio.run(run_async())
+    else:
+        bot.infinity_polling()
\ No newline at end of file
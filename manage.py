@@ -0,0 +1,61 @@
+import argparse
+import os
+import socket
+import sys
+
+from services.bulk import import_articles, export_articles, delete_articles, prune_saved_articles
+from services.cluster import CacheEventFeed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ReWiki Bot administration")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Create or update articles from a JSONL dump")
+    import_parser.add_argument("path", help="JSONL file, one {name, content} object per line, '-' for stdin")
+
+    export_parser = subparsers.add_parser("export", help="Write all articles as JSONL")
+    export_parser.add_argument("path", help="Output file, '-' for stdout")
+
+    delete_parser = subparsers.add_parser("delete", help="Delete the articles listed one name per line")
+    delete_parser.add_argument("path", help="File with article names, '-' for stdin")
+
+    subparsers.add_parser("prune", help="Remove saved references to articles that no longer exist")
+
+    subparsers.add_parser("migrate", help="Create the collections and indexes the bot expects")
+
+    args = parser.parse_args()
+
+    from database import db, db_manager
+
+    # Publishes invalidations for the running bots, nothing is followed here
+    feed = CacheEventFeed(db, {}, f"manage:{socket.gethostname()}:{os.getpid()}")
+
+    if args.command == "migrate":
+        db_manager.migrate()
+        print("Collections and indexes are up to date")
+    elif args.command == "import":
+        with _open(args.path, "r") as f:
+            report = import_articles(db, f, feed=feed)
+        for line_number, error in report["errors"]:
+            print(f"line {line_number}: {error}", file=sys.stderr)
+        print(f"Inserted {report['inserted']}, updated {report['updated']}, rejected {len(report['errors'])}")
+    elif args.command == "export":
+        with _open(args.path, "w") as f:
+            count = export_articles(db, f)
+        print(f"Exported {count} articles", file=sys.stderr)
+    elif args.command == "delete":
+        with _open(args.path, "r") as f:
+            print(f"Deleted {delete_articles(db, f, feed=feed)} articles")
+    elif args.command == "prune":
+        print(f"Removed {prune_saved_articles(db)} missing articles from saved lists")
+
+
+def _open(path, mode):
+    if path == "-":
+        return open(sys.stdin.fileno() if mode == "r" else sys.stdout.fileno(), mode, encoding="utf-8", closefd=False)
+    return open(path, mode, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
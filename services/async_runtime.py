@@ -0,0 +1,19 @@
+from telebot.async_telebot import AsyncTeleBot
+
+
+class FilteringAsyncTeleBot(AsyncTeleBot):
+    # BOT_MODE=async: every update is a task on one event loop, a slow client holds a coroutine instead of a thread
+    def __init__(self, token, update_filter=None, **kwargs):
+        super().__init__(token, **kwargs)
+        self.update_filter = update_filter
+
+    async def process_new_updates(self, updates):
+        accepted = []
+        for update in updates:
+            # Dropped here, before any handler or user lookup runs, the same as DispatchingTeleBot does
+            reason = self.update_filter.check(update) if self.update_filter else None
+            if reason is None:
+                accepted.append(update)
+            elif update.callback_query:
+                await self.update_filter.answer_dropped(self, update.callback_query, reason)
+        await super().process_new_updates(accepted)
@@ -0,0 +1,205 @@
+import json
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from config import MAX_ARTICLE_LENGTH
+from services.revisions import RevisionStore
+from services.sync_io import SyncDatabase, run_sync
+
+BATCH_SIZE = 1000
+EXPORT_FIELDS = {"_id": 0, "name": 1, "content": 1, "author": 1, "created_at": 1, "updated_at": 1}
+
+
+def import_articles(db, lines, batch_size=BATCH_SIZE, feed=None):
+    report = {"inserted": 0, "updated": 0, "errors": []}
+    batch = []
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError:
+            report["errors"].append((line_number, "invalid JSON"))
+            continue
+
+        error = _validate_article(record)
+        if error:
+            report["errors"].append((line_number, error))
+            continue
+
+        batch.append(record)
+        if len(batch) >= batch_size:
+            _write_batch(db, batch, report, feed)
+            batch = []
+
+    if batch:
+        _write_batch(db, batch, report, feed)
+    return report
+
+
+def export_articles(db, output, batch_size=BATCH_SIZE):
+    count = 0
+    for article in db.articles.find({}, EXPORT_FIELDS).sort("name", 1).batch_size(batch_size):
+        output.write(json.dumps(article, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def delete_articles(db, names, batch_size=BATCH_SIZE, feed=None):
+    deleted = 0
+    batch = []
+    for name in names:
+        name = name.strip()
+        if name:
+            batch.append(name)
+        if len(batch) >= batch_size:
+            deleted += _delete_batch(db, batch, feed)
+            batch = []
+
+    if batch:
+        deleted += _delete_batch(db, batch, feed)
+    return deleted
+
+
+def prune_saved_articles(db, batch_size=BATCH_SIZE):
+    # Only ids that no longer resolve travel back, each looked up once through the _id index of articles
+    dangling = db.users.aggregate([
+        {"$unwind": "$saved_articles"},
+        {"$group": {"_id": "$saved_articles._id"}},
+        {"$lookup": {"from": "articles", "localField": "_id", "foreignField": "_id", "as": "article"}},
+        {"$match": {"article": {"$size": 0}}},
+        {"$project": {"_id": 1}}
+    ], allowDiskUse=True)
+
+    pruned = 0
+    batch = []
+    for entry in dangling:
+        batch.append(entry["_id"])
+        if len(batch) >= batch_size:
+            _pull_saved_articles(db, batch)
+            pruned += len(batch)
+            batch = []
+    if batch:
+        _pull_saved_articles(db, batch)
+        pruned += len(batch)
+    return pruned
+
+
+def _pull_saved_articles(db, article_ids):
+    # The multikey index on saved_articles._id finds the users holding them
+    db.users.update_many(
+        {"saved_articles._id": {"$in": article_ids}},
+        {"$pull": {"saved_articles": {"_id": {"$in": article_ids}}}}
+    )
+
+
+def _validate_article(record):
+    if not isinstance(record, dict):
+        return "record is not an object"
+    if not isinstance(record.get("name"), str) or not record["name"] or " " in record["name"]:
+        return "name must be a non-empty string without spaces"
+    if not isinstance(record.get("content"), str) or not record["content"]:
+        return "content must be a non-empty string"
+    if len(record["content"]) > MAX_ARTICLE_LENGTH:
+        return f"content is longer than {MAX_ARTICLE_LENGTH} symbols"
+    return None
+
+
+def _write_batch(db, records, report, feed):
+    existing = {
+        article["name"]: article
+        for article in db.articles.find(
+            {"name": {"$in": [record["name"] for record in records]}}, {"name": 1, "content": 1, "revision": 1}
+        )
+    }
+
+    inserts = []
+    insert_names = []
+    updates = []
+    for record in records:
+        article = existing.get(record["name"])
+        if article is None:
+            # $setOnInsert only, an article created since the lookup above is left alone
+            inserts.append(UpdateOne(
+                {"name": record["name"]},
+                {"$setOnInsert": {
+                    "content": record["content"],
+                    "author": record.get("author"),
+                    "created_at": record.get("created_at") or datetime.now().date().isoformat(),
+                    "updated_at": record.get("updated_at"),
+                    "revision": 0
+                }},
+                upsert=True
+            ))
+            insert_names.append(record["name"])
+        elif article["content"] != record["content"]:
+            updates.append((article, record))
+
+    changed_names = _write_updates(db, updates, report) if updates else []
+
+    if inserts:
+        result = db.articles.bulk_write(inserts, ordered=False)
+        report["inserted"] += result.upserted_count
+        changed_names += [insert_names[index] for index in result.upserted_ids]
+
+    # Running bots follow cache_events, this process shares no memory with them
+    if feed:
+        feed.publish("articles", changed_names)
+        feed.publish("prefix_index", changed_names)
+
+
+def _write_updates(db, updates, report):
+    # Each update only matches the revision read above, an article edited since then is left to its editor and
+    # the revisions are built from the contents that were read, as /edit does with the document it swapped out
+    requests = []
+    revisions = {}
+    for article, record in updates:
+        edited_at = record.get("updated_at") or datetime.now().date().isoformat()
+        requests.append(UpdateOne(
+            {"_id": article["_id"], "revision": article.get("revision")},
+            {"$set": {"content": record["content"], "updated_at": edited_at}, "$inc": {"revision": 1}}
+        ))
+        revisions[article["_id"]] = (record, RevisionStore.make_revision(
+            article["_id"], (article.get("revision") or 0) + 1, article["content"], record["content"], None, edited_at
+        ))
+
+    result = db.articles.bulk_write(requests, ordered=False)
+    if result.matched_count < len(requests):
+        # Rare, so only then are the articles read again to tell which updates lost the race
+        applied = set()
+        for article in db.articles.find({"_id": {"$in": list(revisions)}}, {"content": 1, "revision": 1}):
+            record, revision = revisions[article["_id"]]
+            if article.get("revision") == revision["number"] and article["content"] == record["content"]:
+                applied.add(article["_id"])
+        revisions = {article_id: revision for article_id, revision in revisions.items() if article_id in applied}
+
+    if revisions:
+        db.article_revisions.insert_many([revision for _, revision in revisions.values()], ordered=False)
+    report["updated"] += len(revisions)
+    return [record["name"] for record, _ in revisions.values()]
+
+
+def _delete_batch(db, names, feed):
+    articles = list(db.articles.find({"name": {"$in": names}}, {"name": 1}))
+    if not articles:
+        return 0
+
+    article_ids = [article["_id"] for article in articles]
+    affected_uids = db.users.distinct("uid", {"saved_articles._id": {"$in": article_ids}})
+    result = db.articles.delete_many({"_id": {"$in": article_ids}})
+    run_sync(RevisionStore(SyncDatabase(db)).delete(article_ids))
+    db.users.update_many(
+        {"saved_articles._id": {"$in": article_ids}},
+        {"$pull": {"saved_articles": {"_id": {"$in": article_ids}}}}
+    )
+
+    if feed:
+        deleted_names = [article["name"] for article in articles]
+        feed.publish("articles", deleted_names)
+        feed.publish("prefix_index", deleted_names)
+        feed.publish("markups", [str(article_id) for article_id in article_ids])
+        feed.publish("users", affected_uids)
+    return result.deleted_count
@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.on_invalidate = None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key, broadcast=True):
+        self.invalidate_many([key], broadcast)
+
+    def invalidate_many(self, keys, broadcast=True):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+        if broadcast and self.on_invalidate and keys:
+            self.on_invalidate(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+
+class ArticleCache:
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.on_invalidate = None
+        self._by_id = OrderedDict()
+        self._ids_by_name = {}
+        self._lock = threading.Lock()
+
+    def get(self, article_id):
+        with self._lock:
+            entry = self._by_id.get(article_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            article, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._by_id[article_id]
+                self._forget_name(article["name"], article_id)
+                self.misses += 1
+                return None
+
+            self._by_id.move_to_end(article_id)
+            self.hits += 1
+            return article
+
+    def get_by_name(self, name):
+        with self._lock:
+            article_id = self._ids_by_name.get(name)
+        return self.get(article_id) if article_id else None
+
+    def set(self, article):
+        # The TTL bounds how long a missed invalidation, or a read racing an edit, can keep an old version around
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._by_id[article["_id"]] = (article, expires_at)
+            self._by_id.move_to_end(article["_id"])
+            self._ids_by_name[article["name"]] = article["_id"]
+            while len(self._by_id) > self.maxsize:
+                evicted_id, (evicted, _) = self._by_id.popitem(last=False)
+                self._forget_name(evicted["name"], evicted_id)
+
+    def invalidate(self, name, broadcast=True):
+        with self._lock:
+            article_id = self._ids_by_name.pop(name, None)
+            if article_id:
+                self._by_id.pop(article_id, None)
+        if broadcast and self.on_invalidate:
+            self.on_invalidate([name])
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._ids_by_name.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._by_id), "hits": self.hits, "misses": self.misses}
+
+    def _forget_name(self, name, article_id):
+        # The name may already point at a newer article created under the same name
+        if self._ids_by_name.get(name) == article_id:
+            del self._ids_by_name[name]
+
+
+class MarkupCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.on_invalidate = None
+        self._markups = OrderedDict()
+        self._keys_by_article = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._markups.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._markups.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, article_ids, markup):
+        with self._lock:
+            self._markups[key] = (markup, article_ids)
+            self._markups.move_to_end(key)
+            for article_id in article_ids:
+                self._keys_by_article.setdefault(article_id, set()).add(key)
+            while len(self._markups) > self.maxsize:
+                evicted_key, (_, evicted_ids) = self._markups.popitem(last=False)
+                self._forget(evicted_key, evicted_ids)
+
+    def invalidate(self, article_id, broadcast=True):
+        with self._lock:
+            for key in self._keys_by_article.pop(article_id, set()):
+                entry = self._markups.pop(key, None)
+                if entry is not None:
+                    self._forget(key, entry[1])
+        if broadcast and self.on_invalidate:
+            self.on_invalidate([article_id])
+
+    def clear(self):
+        with self._lock:
+            self._markups.clear()
+            self._keys_by_article.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._markups), "hits": self.hits, "misses": self.misses}
+
+    def _forget(self, key, article_ids):
+        for article_id in article_ids:
+            keys = self._keys_by_article.get(article_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_article[article_id]
@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+
+from pymongo import CursorType
+from pymongo.errors import BulkWriteError, PyMongoError
+from telebot import apihelper, types
+
+from services.dispatch import get_update_chat_id
+
+logger = logging.getLogger(__name__)
+
+EVENT_BATCH_SIZE = 1000
+
+
+class UpdateQueue:
+    def __init__(self, db, shards):
+        self.db = db
+        self.shards = shards
+
+    def publish(self, raw_updates):
+        documents = [
+            {
+                "_id": raw["update_id"],
+                # Every update of a chat goes to the same shard, and so to the same worker process
+                "shard": get_update_chat_id(types.Update.de_json(raw)) % self.shards,
+                "update": raw
+            }
+            for raw in raw_updates
+        ]
+        try:
+            self.db.update_queue.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Updates already queued before an ingest restart keep their first copy
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+
+    def consume(self, shard, bot, batch_size=100, idle_interval=0.2):
+        while True:
+            documents = list(self.db.update_queue.find({"shard": shard}).sort("_id", 1).limit(batch_size))
+            if not documents:
+                time.sleep(idle_interval)
+                continue
+
+            # Acknowledged once handed to the local dispatcher, a crashed worker loses only what it had in flight
+            bot.process_new_updates([types.Update.de_json(document["update"]) for document in documents])
+            self.db.update_queue.delete_many({"_id": {"$in": [document["_id"] for document in documents]}})
+
+
+def run_ingest(token, update_queue, timeout=20):
+    offset = None
+    while True:
+        try:
+            raw_updates = apihelper.get_updates(token, offset, None, timeout, None, timeout)
+        except Exception as e:
+            logger.error("Failed to get updates: %s", e)
+            time.sleep(3)
+            continue
+
+        if raw_updates:
+            update_queue.publish(raw_updates)
+            offset = raw_updates[-1]["update_id"] + 1
+
+
+class CacheEventFeed:
+    def __init__(self, db, caches, origin):
+        self.db = db
+        self.caches = caches
+        self.origin = origin
+        self._last_id = None
+
+    def attach(self):
+        for name, cache in self.caches.items():
+            cache.on_invalidate = lambda keys, name=name: self.publish(name, keys)
+
+    def publish(self, cache, keys):
+        # One event per batch of keys, deleting a widely saved article must not turn into thousands of inserts
+        keys = list(keys)
+        events = [
+            {"cache": cache, "keys": keys[index:index + EVENT_BATCH_SIZE], "origin": self.origin}
+            for index in range(0, len(keys), EVENT_BATCH_SIZE)
+        ]
+        if events:
+            self.db.cache_events.insert_many(events)
+
+    def start(self):
+        threading.Thread(target=self._follow, name="cache-events", daemon=True).start()
+
+    def _follow(self):
+        # cache_events is a capped collection, a tailable cursor on it works like a small oplog. _ids are generated by
+        # each client and do not order events across processes, the collection's natural order (the server's insertion
+        # order) does. So a new cursor replays the collection and resumes right after the last event it saw.
+        self._last_id = self._latest_id()
+        while True:
+            try:
+                self._tail()
+            except PyMongoError as e:
+                logger.error("Cache event feed failed: %s", e)
+            time.sleep(1)
+
+    def _latest_id(self):
+        latest = self.db.cache_events.find_one(sort=[("$natural", -1)])
+        return latest["_id"] if latest else None
+
+    def _tail(self):
+        # Returns once the server closes the cursor, _last_id keeps the position for the next one
+        cursor = self.db.cache_events.find(cursor_type=CursorType.TAILABLE_AWAIT)
+        resumed = self._last_id is None
+        newest_id = self._last_id
+        while cursor.alive:
+            for event in cursor:
+                if resumed:
+                    self._apply(event)
+                elif event["_id"] == self._last_id:
+                    resumed = True
+                newest_id = event["_id"]
+            if not resumed:
+                # The capped collection wrapped past the last event seen, so events may have been missed
+                logger.warning("Cache events were overwritten before they were read, clearing caches")
+                for cache in self.caches.values():
+                    cache.clear()
+                resumed = True
+            self._last_id = newest_id
+
+    def _apply(self, event):
+        if event["origin"] == self.origin:
+            return
+        cache = self.caches[event["cache"]]
+        for key in event["keys"]:
+            cache.invalidate(key, broadcast=False)
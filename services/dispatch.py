@@ -0,0 +1,83 @@
+import logging
+import queue
+import threading
+from functools import partial
+
+from telebot import TeleBot
+
+logger = logging.getLogger(__name__)
+
+
+def get_update_chat_id(update):
+    if update.message:
+        return update.message.chat.id
+    if update.edited_message:
+        return update.edited_message.chat.id
+    if update.callback_query:
+        call = update.callback_query
+        return call.message.chat.id if call.message else call.from_user.id
+    if update.inline_query:
+        return update.inline_query.from_user.id
+    return update.update_id
+
+
+class ChatDispatcher:
+    def __init__(self, handler, workers, queue_size):
+        self.handler = handler
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads = []
+
+    def start(self):
+        for index, updates in enumerate(self._queues):
+            thread = threading.Thread(target=self._work, args=(updates,), name=f"dispatch-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, update, task=None):
+        # Every update of a chat lands on the same worker, which keeps that chat's updates in order.
+        # put() blocks while the worker's queue is full, so ingestion slows down instead of buffering forever.
+        # A task runs instead of the handlers, for work about the update that must stay off the ingesting thread.
+        self._queues[get_update_chat_id(update) % len(self._queues)].put((update, task))
+
+    def stop(self):
+        for updates in self._queues:
+            updates.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _work(self, updates):
+        while True:
+            item = updates.get()
+            if item is None:
+                return
+            update, task = item
+            try:
+                if task:
+                    task()
+                else:
+                    self.handler([update])
+            except Exception:
+                logger.exception("Failed to process update %s", update.update_id)
+
+
+class DispatchingTeleBot(TeleBot):
+    def __init__(self, token, workers, queue_size, update_filter=None, **kwargs):
+        super().__init__(token, threaded=False, **kwargs)
+        self.update_filter = update_filter
+        self.dispatcher = ChatDispatcher(super().process_new_updates, workers, queue_size)
+        self.dispatcher.start()
+
+    def process_new_updates(self, updates):
+        for update in updates:
+            # Advance the polling offset here, the worker that runs the handlers may be behind
+            if update.update_id > self.last_update_id:
+                self.last_update_id = update.update_id
+            # Dropped here, before any handler or user lookup runs
+            reason = self.update_filter.check(update) if self.update_filter else None
+            if reason is None:
+                self.dispatcher.submit(update)
+            elif update.callback_query:
+                # Answered on the chat's worker, an abusive client must not hold up polling with these requests
+                answer = partial(self.update_filter.answer_dropped, self, update.callback_query, reason)
+                self.dispatcher.submit(update, answer)
@@ -0,0 +1,33 @@
+import json
+import os
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "locales")
+DEFAULT_LANGUAGE = "en"
+
+
+class MessageCatalog:
+    def __init__(self, path=LOCALES_DIR):
+        self._templates = {}
+        languages = []
+        for filename in sorted(os.listdir(path)):
+            language, extension = os.path.splitext(filename)
+            if extension != ".json":
+                continue
+            with open(os.path.join(path, filename), encoding="utf-8") as f:
+                for message_id, template in json.load(f).items():
+                    self._templates[(message_id, language)] = template
+            languages.append(language)
+
+        # The default language goes first so multilingual replies keep their usual order
+        languages.sort(key=lambda language: language != DEFAULT_LANGUAGE)
+        self.languages = tuple(languages)
+
+    def get(self, message_id, language, **params):
+        template = self._templates.get((message_id, language))
+        if template is None:
+            template = self._templates[(message_id, DEFAULT_LANGUAGE)]
+        return template.format(**params) if params else template
+
+    def get_all(self, message_id, **params):
+        # Used before the user's language is known
+        return " / ".join(self.get(message_id, language, **params) for language in self.languages)
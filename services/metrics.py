@@ -0,0 +1,201 @@
+import inspect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+# Per thread in the threaded modes and per task in BOT_MODE=async, as every task runs in its own context copy
+_mongo_commands = ContextVar("mongo_commands", default=0)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, description, buckets=LATENCY_BUCKETS):
+        self._histograms[name] = (description, buckets, {})
+
+    def counter(self, name, description, collect=None):
+        # With collect the counts are kept elsewhere, e.g. by a cache, and read at render time like a gauge
+        self._counters[name] = (description, {}, collect)
+
+    def gauge(self, name, description, collect):
+        # collect() returns {labels dict as tuple of pairs: value} at render time
+        self._gauges[name] = (description, collect)
+
+    def observe(self, name, value, **labels):
+        _, buckets, series = self._histograms[name]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        _, series, _ = self._counters[name]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series[key] = series.get(key, 0) + amount
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (description, series, collect) in self._counters.items():
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+                values = collect() if collect else series
+                lines += [f"{name}{_format_labels(key)} {value}" for key, value in values.items()]
+
+            for name, (description, buckets, series) in self._histograms.items():
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+
+        for name, (description, collect) in self._gauges.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+            lines += [f"{name}{_format_labels(key)} {value}" for key, value in collect().items()]
+        return "\n".join(lines) + "\n"
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def __init__(self, registry):
+        self.registry = registry
+
+    def started(self, event):
+        # pymongo publishes events from the thread or task that runs the command, i.e. the one handling the update
+        _mongo_commands.set(_mongo_commands.get() + 1)
+
+    def succeeded(self, event):
+        self.registry.observe("rewiki_mongo_command_seconds", event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        self.registry.inc("rewiki_mongo_command_errors_total", command=event.command_name)
+
+
+def register_default_metrics(registry):
+    registry.histogram("rewiki_handler_seconds", "Time spent in a command or callback handler")
+    registry.counter("rewiki_handler_errors_total", "Handlers that raised an exception")
+    registry.histogram("rewiki_handler_mongo_commands", "Mongo round trips made while handling one update", COUNT_BUCKETS)
+    registry.histogram("rewiki_mongo_command_seconds", "Mongo command latency")
+    registry.counter("rewiki_mongo_command_errors_total", "Mongo commands that failed")
+    registry.histogram("rewiki_telegram_request_seconds", "Telegram Bot API request latency")
+    registry.counter("rewiki_updates_dropped_total", "Updates dropped as duplicates or by the per-user rate limit")
+
+
+def register_cache_metrics(registry, caches):
+    def collect(field):
+        return lambda: {(("cache", name),): cache.stats()[field] for name, cache in caches.items()}
+
+    registry.gauge("rewiki_cache_size", "Entries held by an in-process cache", collect("size"))
+    registry.counter("rewiki_cache_hits_total", "Cache hits since start", collect("hits"))
+    registry.counter("rewiki_cache_misses_total", "Cache misses since start", collect("misses"))
+
+
+def instrument_handlers(bot, registry, slow_update_ms=0):
+    handler_lists = (bot.message_handlers, bot.callback_query_handlers, bot.inline_handlers)
+    for handlers in handler_lists:
+        for handler in handlers:
+            handler["function"] = _instrument(handler["function"], registry, slow_update_ms)
+
+
+def _instrument(function, registry, slow_update_ms):
+    name = function.__name__
+
+    if inspect.iscoroutinefunction(function):
+        @wraps(function)
+        async def async_wrapper(*args, **kwargs):
+            _mongo_commands.set(0)
+            started_at = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            except Exception:
+                registry.inc("rewiki_handler_errors_total", handler=name)
+                raise
+            finally:
+                _observe_handler(registry, name, time.perf_counter() - started_at, slow_update_ms)
+
+        return async_wrapper
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        _mongo_commands.set(0)
+        started_at = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except Exception:
+            registry.inc("rewiki_handler_errors_total", handler=name)
+            raise
+        finally:
+            _observe_handler(registry, name, time.perf_counter() - started_at, slow_update_ms)
+
+    return wrapper
+
+
+def _observe_handler(registry, name, elapsed, slow_update_ms):
+    mongo_commands = _mongo_commands.get()
+    registry.observe("rewiki_handler_seconds", elapsed, handler=name)
+    registry.observe("rewiki_handler_mongo_commands", mongo_commands, handler=name)
+    if slow_update_ms and elapsed * 1000 >= slow_update_ms:
+        logger.warning("Slow update in %s: %.1f ms, %s Mongo commands", name, elapsed * 1000, mongo_commands)
+
+
+def start_metrics_server(registry, host, port):
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{label}="{value}"' for label, value in key) + "}"
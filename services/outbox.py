@@ -0,0 +1,188 @@
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+from telebot.apihelper import ApiHTTPException, ApiTelegramException
+
+from services.token_bucket import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxJob:
+    def __init__(self, method, args, kwargs, edit_key=None):
+        self.method = method
+        self.args = args
+        # Edits read their keyboard when first sent, so a newer one queued meanwhile replaces it
+        self.kwargs = kwargs
+        self.edit_key = edit_key
+        self.attempt = 0
+
+
+class Outbox:
+    def __init__(self, senders, global_rate, chat_rate, chat_burst, max_retries, queue_size=1000, metrics=None):
+        self.metrics = metrics
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets = {}
+        self._pending_edits = {}
+        self._lock = threading.Lock()
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(senders)]
+        self._threads = []
+        self._send_message = None
+        self._edit_message_reply_markup = None
+
+    def install(self, bot):
+        self._send_message = bot.send_message
+        self._edit_message_reply_markup = bot.edit_message_reply_markup
+        # reply_to goes through send_message, so replies are queued too
+        bot.send_message = self.send_message
+        bot.edit_message_reply_markup = self.edit_message_reply_markup
+
+    def start(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=len(self._queues))
+        session.mount("https://", adapter)
+        apihelper.session = session
+
+        for index, jobs in enumerate(self._queues):
+            thread = threading.Thread(target=self._work, args=(jobs,), name=f"outbox-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for jobs in self._queues:
+            jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def send_message(self, chat_id, text, *args, **kwargs):
+        self._enqueue(chat_id, OutboxJob(self._send_message, (chat_id, text) + args, kwargs))
+
+    def edit_message_reply_markup(self, chat_id=None, message_id=None, **kwargs):
+        key = (chat_id, message_id)
+        with self._lock:
+            # A newer keyboard for a message still waiting in the queue replaces the old one
+            coalesced = key in self._pending_edits
+            self._pending_edits[key] = kwargs
+        if not coalesced:
+            self._enqueue(chat_id, OutboxJob(self._edit_message_reply_markup, (), None, edit_key=key))
+
+    def _enqueue(self, chat_id, job):
+        # One sender per chat keeps a chat's messages in order
+        self._queues[hash(chat_id) % len(self._queues)].put((chat_id, job))
+
+    def _work(self, jobs):
+        # Each chat waits in its own FIFO and the heap holds when its head is due next, so a chat that is over its
+        # rate or backing off after an error is set aside instead of blocking the other chats of this sender
+        pending = {}
+        schedule = []
+        sequence = itertools.count()
+        while True:
+            timeout = max(0, schedule[0][0] - time.monotonic()) if schedule else None
+            try:
+                item = jobs.get(timeout=timeout)
+                while True:
+                    if item is None:
+                        return
+                    chat_id, job = item
+                    if chat_id not in pending:
+                        pending[chat_id] = deque()
+                        heapq.heappush(schedule, (time.monotonic(), next(sequence), chat_id))
+                    pending[chat_id].append(job)
+                    item = jobs.get_nowait()
+            except queue.Empty:
+                pass
+
+            while schedule and schedule[0][0] <= time.monotonic():
+                _, _, chat_id = heapq.heappop(schedule)
+                delay = self._run_head(chat_id, pending[chat_id])
+                if pending[chat_id]:
+                    heapq.heappush(schedule, (time.monotonic() + delay, next(sequence), chat_id))
+                else:
+                    del pending[chat_id]
+
+    def _run_head(self, chat_id, chat_jobs):
+        # Returns how long the chat's next job has to wait
+        chat_bucket = self._chat_bucket(chat_id)
+        delay = max(self.global_bucket.wait_time(), chat_bucket.wait_time())
+        if delay > 0:
+            return delay
+        if not self.global_bucket.try_acquire():
+            return self.global_bucket.wait_time()
+        # Only this sender takes from the chat's bucket, the wait_time() check above still holds
+        chat_bucket.try_acquire()
+
+        job = chat_jobs[0]
+        retry_after = self._attempt(job)
+        if retry_after is None:
+            chat_jobs.popleft()
+            return 0
+
+        job.attempt += 1
+        if job.attempt > self.max_retries:
+            logger.error("Giving up on %s after %s retries", job.method.__name__, self.max_retries)
+            chat_jobs.popleft()
+            return 0
+        return retry_after
+
+    def _attempt(self, job):
+        # Returns None once the job is done, sent or rejected for good, otherwise the delay before retrying it
+        if job.kwargs is None:
+            with self._lock:
+                kwargs = self._pending_edits.pop(job.edit_key)
+            job.kwargs = dict(kwargs, chat_id=job.edit_key[0], message_id=job.edit_key[1])
+
+        name = job.method.__name__
+        started_at = time.perf_counter()
+        try:
+            job.method(*job.args, **job.kwargs)
+            return None
+        except ApiTelegramException as e:
+            if e.error_code == 400 and "message is not modified" in e.description:
+                return None
+            if e.error_code != 429 and e.error_code < 500:
+                logger.error("Telegram rejected %s: %s", name, e.description)
+                return None
+            return (e.result_json.get("parameters") or {}).get("retry_after", 2 ** job.attempt)
+        except ApiHTTPException as e:
+            # Error pages that are not Bot API JSON, e.g. a 502 from a proxy in front of it
+            if e.result.status_code != 429 and e.result.status_code < 500:
+                logger.error("Telegram request %s failed: %s", name, e)
+                return None
+            logger.warning("Telegram request %s failed with HTTP %s", name, e.result.status_code)
+            return 2 ** job.attempt
+        except requests.RequestException as e:
+            logger.warning("Telegram request %s failed: %s", name, e)
+            return 2 ** job.attempt
+        except Exception:
+            logger.exception("Failed to send a queued Telegram request")
+            return None
+        finally:
+            if self.metrics:
+                self.metrics.observe("rewiki_telegram_request_seconds", time.perf_counter() - started_at, method=name)
+
+    def _chat_bucket(self, chat_id):
+        with self._lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                if len(self._chat_buckets) > 10000:
+                    self._drop_idle_buckets()
+                bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            return bucket
+
+    def _drop_idle_buckets(self):
+        now = time.monotonic()
+        idle = [chat_id for chat_id, bucket in self._chat_buckets.items() if now - bucket.updated_at > 60]
+        for chat_id in idle:
+            del self._chat_buckets[chat_id]
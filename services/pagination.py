@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+
+class ResultSetStore:
+    def __init__(self, db, ttl):
+        self.db = db
+        self.ttl = ttl
+
+    async def create(self, articles):
+        result_set_id = ObjectId()
+        await self.db.result_sets.insert_one({
+            "_id": result_set_id,
+            "items": [{"_id": article["_id"], "name": article["name"]} for article in articles],
+            "total": len(articles),
+            # Removed by the TTL index on expires_at
+            "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        })
+        return str(result_set_id)
+
+    async def get_page(self, result_set_id, offset, limit):
+        try:
+            result_set_id = ObjectId(result_set_id)
+        except InvalidId:
+            return None, False
+
+        result_set = await self.db.result_sets.find_one(
+            {"_id": result_set_id},
+            {"items": {"$slice": [offset, limit]}, "total": 1}
+        )
+        if not result_set:
+            return None, False
+        return result_set["items"], offset + limit < result_set["total"]
@@ -0,0 +1,68 @@
+import threading
+from bisect import bisect_left, insort
+
+
+class PrefixIndex:
+    def __init__(self, db):
+        self.db = db
+        self.on_invalidate = None
+        self._entries = []
+        self._built = False
+        self._lock = threading.Lock()
+
+    def build(self):
+        entries = sorted(
+            (article["name"].casefold(), article["name"], str(article["_id"]))
+            for article in self.db.articles.find({}, {"name": 1})
+        )
+        with self._lock:
+            self._entries = entries
+            self._built = True
+
+    def clear(self):
+        # The index has to list every article, so clearing it means reading the names again
+        self.build()
+
+    def search(self, prefix, limit):
+        if not self._built:
+            self.build()
+
+        key = prefix.casefold()
+        matches = []
+        with self._lock:
+            index = bisect_left(self._entries, (key,))
+            while index < len(self._entries) and len(matches) < limit:
+                entry_key, name, article_id = self._entries[index]
+                if not entry_key.startswith(key):
+                    break
+                matches.append((name, article_id))
+                index += 1
+        return matches
+
+    def add(self, name, article_id):
+        # Handlers already know what changed, so their own writes reach the index without a read
+        self._replace(name, article_id)
+        self._broadcast(name)
+
+    def remove(self, name):
+        self._replace(name, None)
+        self._broadcast(name)
+
+    def invalidate(self, name, broadcast=True):
+        # Re-reads a single name through the unique name index after another process created or deleted it
+        article = self.db.articles.find_one({"name": name}, {"name": 1})
+        self._replace(name, str(article["_id"]) if article else None)
+        if broadcast:
+            self._broadcast(name)
+
+    def _replace(self, name, article_id):
+        with self._lock:
+            index = bisect_left(self._entries, (name.casefold(), name))
+            if index < len(self._entries) and self._entries[index][1] == name:
+                del self._entries[index]
+            if article_id:
+                insort(self._entries, (name.casefold(), name, article_id))
+
+    def _broadcast(self, name):
+        if self.on_invalidate:
+            self.on_invalidate([name])
@@ -0,0 +1,90 @@
+from difflib import SequenceMatcher
+
+from pymongo import DESCENDING
+
+# Every SNAPSHOT_INTERVAL-th revision also stores the full content it replaced
+SNAPSHOT_INTERVAL = 20
+
+
+class RevisionStore:
+    def __init__(self, db):
+        self.db = db
+
+    async def record(self, article_id, number, previous, content, author, edited_at):
+        await self.db.article_revisions.insert_one(
+            self.make_revision(article_id, number, previous, content, author, edited_at)
+        )
+
+    @classmethod
+    def make_revision(cls, article_id, number, previous, content, author, edited_at):
+        # Deltas point backwards, from the new content to the previous one, so the article itself stays current
+        delta, added, removed = cls._diff(content, previous)
+        revision = {
+            "article_id": article_id,
+            "number": number,
+            "delta": delta,
+            "added": added,
+            "removed": removed,
+            "author": author,
+            "edited_at": edited_at
+        }
+        if number % SNAPSHOT_INTERVAL == 0:
+            revision["snapshot"] = previous
+        return revision
+
+    async def get_page(self, article_id, offset, limit):
+        revisions = await self.db.article_revisions.find(
+            {"article_id": article_id},
+            {"delta": 0, "snapshot": 0}
+        ).sort("number", DESCENDING).skip(offset).limit(limit + 1).to_list()
+        return revisions[:limit], len(revisions) > limit
+
+    async def get_content(self, article, number):
+        # Walks back from the nearest snapshot at or after number, or from the current content when the article has
+        # not been edited that often yet, so at most SNAPSHOT_INTERVAL deltas are read and applied
+        snapshot_number = -(-number // SNAPSHOT_INTERVAL) * SNAPSHOT_INTERVAL
+        revisions = await self._get_deltas(article["_id"], number, snapshot_number)
+        if not revisions:
+            return None
+
+        content = article["content"]
+        if revisions[0]["number"] == snapshot_number:
+            if "snapshot" in revisions[0]:
+                content = revisions[0]["snapshot"]
+                revisions = revisions[1:]
+            else:
+                # Recorded before snapshots were kept, only the full walk from the current content is left
+                revisions = await self._get_deltas(article["_id"], number, None)
+
+        for revision in revisions:
+            content = self._apply(content, revision["delta"])
+        return content
+
+    async def _get_deltas(self, article_id, first, last):
+        number = {"$gte": first} if last is None else {"$gte": first, "$lte": last}
+        return await self.db.article_revisions.find(
+            {"article_id": article_id, "number": number},
+            {"number": 1, "delta": 1, "snapshot": 1}
+        ).sort("number", DESCENDING).to_list()
+
+    async def delete(self, article_ids):
+        await self.db.article_revisions.delete_many({"article_id": {"$in": article_ids}})
+
+    @staticmethod
+    def _diff(source, target):
+        # Spans copied from source are stored as [start, end], everything else as literal text
+        delta = []
+        added = removed = 0
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, source, target, autojunk=False).get_opcodes():
+            if tag == "equal":
+                delta.append([i1, i2])
+                continue
+            if j2 > j1:
+                delta.append(target[j1:j2])
+            added += i2 - i1
+            removed += j2 - j1
+        return delta, added, removed
+
+    @staticmethod
+    def _apply(source, delta):
+        return "".join(source[op[0]:op[1]] if isinstance(op, list) else op for op in delta)
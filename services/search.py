@@ -0,0 +1,39 @@
+import re
+
+
+class ArticleSearch:
+    def __init__(self, db, text_index=True):
+        self.db = db
+        # Without a text index (the mongomock backend has none) search is a prefix match on the unique name index
+        self.text_index = text_index
+
+    async def search(self, query, skip, limit):
+        # One extra row tells the caller whether another page exists
+        terms = self._escape_terms(query)
+        if self.text_index and terms:
+            articles = await (
+                self.db.articles.find(
+                    {"$text": {"$search": terms}},
+                    {"name": 1, "score": {"$meta": "textScore"}}
+                )
+                .sort([("score", {"$meta": "textScore"}), ("name", 1)])
+                .skip(skip)
+                .limit(limit + 1)
+                .to_list()
+            )
+            return articles[:limit], len(articles) > limit
+
+        articles = await (
+            self.db.articles.find({"name": {"$regex": f"^{re.escape(query)}"}}, {"name": 1})
+            .sort("name", 1)
+            .skip(skip)
+            .limit(limit + 1)
+            .to_list()
+        )
+        return articles[:limit], len(articles) > limit
+
+    @staticmethod
+    def _escape_terms(query):
+        # Drop the $text phrase and negation operators so user input is only ever treated as plain words
+        words = [word.lstrip("-") for word in query.replace('"', " ").split()]
+        return " ".join(word for word in words if word)
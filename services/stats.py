@@ -0,0 +1,74 @@
+import logging
+import threading
+import time
+
+from bson import ObjectId
+from pymongo import DESCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class ArticleStats:
+    def __init__(self, db, flush_interval, leaderboard_size, leaderboard_interval):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.leaderboard_size = leaderboard_size
+        self.leaderboard_interval = leaderboard_interval
+        self.leaderboard = []
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def record_view(self, article_id):
+        self._record(article_id, "views")
+
+    def record_save(self, article_id):
+        self._record(article_id, "saves")
+
+    def start(self):
+        threading.Thread(target=self._run, name="article-stats", daemon=True).start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        requests = [UpdateOne({"_id": ObjectId(article_id)}, {"$inc": counts}) for article_id, counts in pending.items()]
+        try:
+            self.db.articles.bulk_write(requests, ordered=False)
+        except PyMongoError as e:
+            logger.error("Failed to flush article stats: %s", e)
+            # Counts go back into the next batch instead of being dropped
+            with self._lock:
+                for article_id, counts in pending.items():
+                    for field, count in counts.items():
+                        self._add(article_id, field, count)
+
+    def refresh_leaderboard(self):
+        self.leaderboard = list(
+            self.db.articles.find({"views": {"$gt": 0}}, {"name": 1, "views": 1, "saves": 1})
+            .sort([("views", DESCENDING), ("saves", DESCENDING)])
+            .limit(self.leaderboard_size)
+        )
+
+    def _record(self, article_id, field):
+        with self._lock:
+            self._add(str(article_id), field, 1)
+
+    def _add(self, article_id, field, count):
+        counts = self._pending.setdefault(article_id, {})
+        counts[field] = counts.get(field, 0) + count
+
+    def _run(self):
+        refreshed_at = None
+        while True:
+            # Anything escaping here would end the thread, and with it every later flush and refresh
+            try:
+                self.flush()
+                if refreshed_at is None or time.monotonic() - refreshed_at >= self.leaderboard_interval:
+                    self.refresh_leaderboard()
+                    refreshed_at = time.monotonic()
+            except Exception:
+                logger.exception("Article stats iteration failed")
+            time.sleep(self.flush_interval)
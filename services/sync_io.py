@@ -0,0 +1,97 @@
+from functools import wraps
+
+
+def run_sync(coroutine):
+    # Behind the adapters below a shared handler never really suspends, so one send() runs it to the end
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError("A handler awaited asynchronous I/O while running in synchronous mode")
+
+
+def _awaitable(method):
+    @wraps(method)
+    async def call(*args, **kwargs):
+        return method(*args, **kwargs)
+
+    return call
+
+
+class SyncBot:
+    # Gives a TeleBot the awaitable interface of AsyncTeleBot, so the command classes are written once for both
+    def __init__(self, bot):
+        self.bot = bot
+
+    def message_handler(self, **kwargs):
+        return self._register(self.bot.message_handler, kwargs)
+
+    def callback_query_handler(self, **kwargs):
+        return self._register(self.bot.callback_query_handler, kwargs)
+
+    def inline_handler(self, **kwargs):
+        return self._register(self.bot.inline_handler, kwargs)
+
+    @staticmethod
+    def _register(register, kwargs):
+        def decorator(handler):
+            @wraps(handler)
+            def run(*args):
+                return run_sync(handler(*args))
+
+            register(**kwargs)(run)
+            return handler
+
+        return decorator
+
+    def __getattr__(self, name):
+        return _awaitable(getattr(self.bot, name))
+
+
+class SyncDatabase:
+    # Same for a pymongo or mongomock Database, mirroring the AsyncMongoClient API the handlers are written against
+    def __init__(self, db):
+        self.db = db
+
+    def __getattr__(self, name):
+        return SyncCollection(getattr(self.db, name))
+
+    def __getitem__(self, name):
+        return SyncCollection(self.db[name])
+
+
+class SyncCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, *args, **kwargs):
+        return SyncCursor(self.collection.find(*args, **kwargs))
+
+    async def aggregate(self, *args, **kwargs):
+        return SyncCursor(self.collection.aggregate(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return _awaitable(getattr(self.collection, name))
+
+
+class SyncCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        return SyncCursor(self.cursor.sort(*args, **kwargs))
+
+    def skip(self, skip):
+        return SyncCursor(self.cursor.skip(skip))
+
+    def limit(self, limit):
+        return SyncCursor(self.cursor.limit(limit))
+
+    async def to_list(self, length=None):
+        documents = []
+        for document in self.cursor:
+            documents.append(document)
+            if length is not None and len(documents) >= length:
+                break
+        return documents
@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+
+from services.token_bucket import TokenBucket
+
+
+class UpdateFilter:
+    def __init__(self, rate, burst, window, max_users, metrics=None, catalog=None):
+        self.rate = rate
+        self.burst = burst
+        self.window = window
+        self.max_users = max_users
+        self.metrics = metrics
+        self.catalog = catalog
+        self._buckets = OrderedDict()
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, update):
+        # Returns why the update has to be dropped, None lets it through
+        with self._lock:
+            now = time.monotonic()
+            # Every key lives for the same window, so the oldest keys always expire first
+            while self._seen and next(iter(self._seen.values())) <= now:
+                self._seen.popitem(last=False)
+
+            keys = [("update", update.update_id)]
+            call = update.callback_query
+            if call:
+                message_id = (call.message.chat.id, call.message.message_id) if call.message else call.inline_message_id
+                keys.append(("callback", call.from_user.id, message_id, call.data))
+            if any(key in self._seen for key in keys):
+                return self._drop("duplicate")
+            for key in keys:
+                self._seen[key] = now + self.window
+
+            # Inline queries are answered from memory and arrive once per keystroke, they are not throttled
+            user = update.message.from_user if update.message else call.from_user if call else None
+            if user and not self._bucket(user.id).try_acquire():
+                return self._drop("throttled")
+            return None
+
+    def answer_dropped(self, bot, call, reason):
+        # Stops the loading spinner on the tapped button, a throttled user also learns why nothing happened
+        return bot.answer_callback_query(call.id, self.dropped_text(call, reason))
+
+    def dropped_text(self, call, reason):
+        if reason == "throttled" and self.catalog:
+            return self.catalog.get("too_many_requests", call.from_user.language_code)
+        return None
+
+    def _bucket(self, uid):
+        bucket = self._buckets.get(uid)
+        if bucket is None:
+            bucket = self._buckets[uid] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(uid)
+        return bucket
+
+    def _drop(self, reason):
+        if self.metrics:
+            self.metrics.inc("rewiki_updates_dropped_total", reason=reason)
+        return reason
@@ -0,0 +1,96 @@
+import hmac
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    def __init__(self, bot, host, port, path, secret_token=None, batch_size=100, batch_interval=0.05):
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._updates = queue.Queue(maxsize=batch_size * 10)
+        self._server = ThreadingHTTPServer((host, port), self._build_handler())
+        self._batcher = threading.Thread(target=self._drain, name="webhook-batcher", daemon=True)
+
+    def serve_forever(self):
+        self._batcher.start()
+        logger.info("Listening for webhook updates on %s:%s%s", *self._server.server_address[:2], self.path)
+        self._server.serve_forever()
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def is_authorized(self, header_value):
+        if not self.secret_token:
+            return True
+        # compare_digest only takes ASCII str, so the raw header bytes (http.server decodes them as latin-1) are compared
+        return header_value is not None and hmac.compare_digest(header_value.encode("latin-1"), self.secret_token.encode())
+
+    def accept(self, body):
+        payload = json.loads(body)
+        # Telegram posts one update per request, recorded dumps may hold a list of them.
+        # Everything is converted before anything is queued, so a malformed entry rejects its request, not a batch.
+        updates = [self._parse_update(update) for update in (payload if isinstance(payload, list) else [payload])]
+        for update in updates:
+            self._updates.put(update)
+
+    @staticmethod
+    def _parse_update(update):
+        if not isinstance(update, dict) or not isinstance(update.get("update_id"), int):
+            raise ValueError("not a Telegram update")
+        return types.Update.de_json(update)
+
+    def _drain(self):
+        while True:
+            batch = [self._updates.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._updates.get(timeout=self.batch_interval))
+            except queue.Empty:
+                pass
+
+            try:
+                self.bot.process_new_updates(batch)
+            except Exception:
+                logger.exception("Failed to process a batch of %s webhook updates", len(batch))
+
+    def _build_handler(self):
+        server = self
+
+        class WebhookRequestHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != server.path:
+                    self.send_error(404)
+                    return
+                if not server.is_authorized(self.headers.get(SECRET_HEADER)):
+                    self.send_error(403)
+                    return
+
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                try:
+                    server.accept(body)
+                except (KeyError, TypeError, ValueError):
+                    self.send_error(400)
+                    return
+
+                # Handlers run on the batcher and dispatcher threads, Telegram only waits for the queueing
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        return WebhookRequestHandler
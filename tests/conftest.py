@@ -0,0 +1,29 @@
+import pytest
+
+from database import DatabaseManager
+
+
+@pytest.fixture
+def memory_db():
+    manager = DatabaseManager(backend="memory")
+    yield manager.db
+    manager.close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    for module in ("services.cache", "services.throttle", "services.token_bucket"):
+        monkeypatch.setattr(f"{module}.time", clock)
+    return clock
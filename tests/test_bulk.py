@@ -0,0 +1,94 @@
+import json
+
+from bson import ObjectId
+
+from services.bulk import delete_articles, import_articles, prune_saved_articles
+from services.cluster import CacheEventFeed
+
+
+def lines(*records):
+    return [json.dumps(record) for record in records]
+
+
+def published(db):
+    return [(event["cache"], event["keys"]) for event in db.cache_events.find()]
+
+
+def test_import_inserts_updates_and_reports_errors(memory_db):
+    feed = CacheEventFeed(memory_db, {}, "manage")
+    import_articles(memory_db, lines({"name": "a", "content": "one"}, {"name": "b", "content": "two"}))
+
+    report = import_articles(memory_db, lines(
+        {"name": "a", "content": "one"},
+        {"name": "b", "content": "two, changed"},
+        {"name": "c", "content": "three"},
+        {"name": "bad name", "content": "x"}
+    ) + ["{not json"], batch_size=2, feed=feed)
+
+    assert report == {"inserted": 1, "updated": 1, "errors": [(4, "name must be a non-empty string without spaces"),
+                                                              (5, "invalid JSON")]}
+    changed = memory_db.articles.find_one({"name": "b"})
+    assert (changed["content"], changed["revision"]) == ("two, changed", 1)
+    assert memory_db.articles.find_one({"name": "a"})["revision"] == 0
+    # Unchanged articles are left alone and not invalidated anywhere
+    assert published(memory_db) == [("articles", ["b"]), ("prefix_index", ["b"]),
+                                    ("articles", ["c"]), ("prefix_index", ["c"])]
+
+    revision = memory_db.article_revisions.find_one({"article_id": changed["_id"]})
+    assert revision["number"] == 1
+
+
+def test_import_skips_articles_edited_since_they_were_read(memory_db, monkeypatch):
+    import_articles(memory_db, lines({"name": "a", "content": "one"}))
+    articles = type(memory_db.articles)
+    original_find = articles.find
+
+    def find_then_edit(collection, *args, **kwargs):
+        documents = list(original_find(collection, *args, **kwargs))
+        if collection.name == "articles" and args and "name" in args[0]:
+            # An /edit lands between the batch's read and its write
+            collection.update_one({"name": "a"}, {"$set": {"content": "edited"}, "$inc": {"revision": 1}})
+        return iter(documents)
+
+    monkeypatch.setattr(articles, "find", find_then_edit)
+    report = import_articles(memory_db, lines({"name": "a", "content": "imported"}))
+    monkeypatch.undo()
+
+    assert report["updated"] == 0
+    assert memory_db.articles.find_one({"name": "a"})["content"] == "edited"
+    assert memory_db.article_revisions.count_documents({}) == 0
+
+
+def test_delete_removes_articles_revisions_and_saved_entries(memory_db):
+    feed = CacheEventFeed(memory_db, {}, "manage")
+    import_articles(memory_db, lines({"name": "a", "content": "one"}, {"name": "b", "content": "two"}))
+    import_articles(memory_db, lines({"name": "a", "content": "one, changed"}))
+    a, b = (memory_db.articles.find_one({"name": name})["_id"] for name in ("a", "b"))
+    memory_db.users.insert_many([
+        {"uid": 1, "saved_articles": [{"_id": a, "name": "a"}, {"_id": b, "name": "b"}]},
+        {"uid": 2, "saved_articles": [{"_id": b, "name": "b"}]}
+    ])
+
+    assert delete_articles(memory_db, ["a\n", "\n", "missing\n"], feed=feed) == 1
+
+    assert [article["name"] for article in memory_db.articles.find()] == ["b"]
+    assert memory_db.article_revisions.count_documents({}) == 0
+    assert [[entry["name"] for entry in user["saved_articles"]] for user in memory_db.users.find()] == [["b"], ["b"]]
+    assert published(memory_db) == [("articles", ["a"]), ("prefix_index", ["a"]), ("markups", [str(a)]),
+                                    ("users", [1])]
+
+
+def test_prune_pulls_only_dangling_saved_articles(memory_db):
+    kept = memory_db.articles.insert_one({"name": "kept"}).inserted_id
+    gone, also_gone = ObjectId(), ObjectId()
+    memory_db.users.insert_many([
+        {"uid": 1, "saved_articles": [{"_id": kept, "name": "kept"}, {"_id": gone, "name": "gone"}]},
+        {"uid": 2, "saved_articles": [{"_id": gone, "name": "gone"}, {"_id": also_gone, "name": "also_gone"}]},
+        {"uid": 3, "saved_articles": []}
+    ])
+
+    assert prune_saved_articles(memory_db, batch_size=1) == 2
+
+    saved = [[entry["name"] for entry in user["saved_articles"]] for user in memory_db.users.find()]
+    assert saved == [["kept"], [], []]
+    assert prune_saved_articles(memory_db) == 0
@@ -0,0 +1,74 @@
+from services.cache import ArticleCache, LRUCache, MarkupCache
+
+
+def make_article(article_id, name):
+    return {"_id": article_id, "name": name, "text": f"*{name}*"}
+
+
+def test_markup_invalidation_drops_every_page_with_the_article():
+    cache = MarkupCache(maxsize=10)
+    cache.set(("a", "b"), ("a", "b"), "page 1")
+    cache.set(("b", "c"), ("b", "c"), "page 2")
+    cache.set(("c",), ("c",), "page 3")
+
+    cache.invalidate("b")
+
+    assert cache.get(("a", "b")) is None
+    assert cache.get(("b", "c")) is None
+    assert cache.get(("c",)) == "page 3"
+
+
+def test_markup_eviction_keeps_the_article_index_consistent():
+    cache = MarkupCache(maxsize=1)
+    cache.set(("a",), ("a",), "page 1")
+    cache.set(("b",), ("b",), "page 2")
+
+    assert cache.get(("a",)) is None
+    assert "a" not in cache._keys_by_article
+
+    cache.invalidate("b")
+    assert cache.stats()["size"] == 0
+
+
+def test_article_invalidation_by_name():
+    cache = ArticleCache(maxsize=10)
+    cache.set(make_article("1", "Python"))
+
+    assert cache.get_by_name("Python")["_id"] == "1"
+
+    cache.invalidate("Python")
+
+    assert cache.get("1") is None
+    assert cache.get_by_name("Python") is None
+
+
+def test_article_cache_expires_entries(clock):
+    cache = ArticleCache(maxsize=10, ttl=60)
+    cache.set(make_article("1", "Python"))
+
+    clock.advance(61)
+
+    assert cache.get_by_name("Python") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_article_eviction_keeps_a_recreated_name():
+    cache = ArticleCache(maxsize=1)
+    cache.set(make_article("1", "Python"))
+    cache.set(make_article("2", "Python"))
+
+    assert cache.get_by_name("Python")["_id"] == "2"
+
+
+def test_invalidations_are_broadcast_once_per_batch():
+    published = []
+    cache = LRUCache(maxsize=10)
+    cache.on_invalidate = published.append
+    for uid in (1, 2, 3):
+        cache.set(uid, {"uid": uid})
+
+    cache.invalidate_many([1, 2])
+    cache.invalidate(3, broadcast=False)
+
+    assert published == [[1, 2]]
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,55 @@
+from services.cluster import CacheEventFeed, EVENT_BATCH_SIZE
+
+
+class RecordingCache:
+    def __init__(self):
+        self.invalidated = []
+        self.cleared = 0
+
+    def invalidate(self, key, broadcast=True):
+        assert not broadcast
+        self.invalidated.append(key)
+
+    def clear(self):
+        self.cleared += 1
+
+
+def test_feed_resumes_after_the_last_event_seen(memory_db):
+    articles = RecordingCache()
+    publisher = CacheEventFeed(memory_db, {}, "manage")
+    feed = CacheEventFeed(memory_db, {"articles": articles}, "worker")
+    publisher.publish("articles", ["before start"])
+    feed._last_id = feed._latest_id()
+
+    publisher.publish("articles", ["a", "b"])
+    feed.publish("articles", ["own"])
+    feed._tail()
+
+    assert articles.invalidated == ["a", "b"]
+
+    publisher.publish("articles", ["c"])
+    feed._tail()
+    feed._tail()
+
+    assert articles.invalidated == ["a", "b", "c"]
+    assert articles.cleared == 0
+
+
+def test_feed_clears_caches_when_its_position_was_overwritten(memory_db):
+    articles = RecordingCache()
+    feed = CacheEventFeed(memory_db, {"articles": articles}, "worker")
+    CacheEventFeed(memory_db, {}, "manage").publish("articles", ["a"])
+    feed._last_id = "overwritten"
+
+    feed._tail()
+    feed._tail()
+
+    assert articles.cleared == 1
+    assert articles.invalidated == []
+
+
+def test_publish_batches_keys(memory_db):
+    CacheEventFeed(memory_db, {}, "manage").publish("users", range(EVENT_BATCH_SIZE + 1))
+
+    events = list(memory_db.cache_events.find())
+    assert [len(event["keys"]) for event in events] == [EVENT_BATCH_SIZE, 1]
@@ -0,0 +1,34 @@
+from database import DatabaseManager
+
+
+def test_missing_schema_lists_what_migrate_creates():
+    manager = DatabaseManager(backend="memory")
+    assert manager.missing_schema() == []
+
+    manager.db.articles.drop_index("name_1")
+    manager.db.result_sets.drop_indexes()
+
+    assert manager.missing_schema() == ["articles.name_1", "result_sets.expires_at_1"]
+
+    manager.migrate()
+    assert manager.missing_schema() == []
+
+
+def test_migrate_converts_legacy_saved_article_names():
+    manager = DatabaseManager(backend="memory")
+    db = manager.db
+    kept = db.articles.insert_one({"name": "kept"}).inserted_id
+    db.users.insert_many([
+        {"uid": 1, "saved_articles": ["kept", "deleted"]},
+        {"uid": 2, "saved_articles": [{"_id": kept, "name": "kept"}]},
+        {"uid": 3, "saved_articles": []}
+    ])
+
+    manager.migrate()
+    manager.migrate()
+
+    assert [user["saved_articles"] for user in db.users.find()] == [
+        [{"_id": kept, "name": "kept"}],
+        [{"_id": kept, "name": "kept"}],
+        []
+    ]
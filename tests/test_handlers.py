@@ -0,0 +1,154 @@
+import asyncio
+import json
+
+import pytest
+from bson import ObjectId
+from telebot import types
+
+from commands.article import ArticleCommands
+from commands.base import BaseCommands
+from config import user_cache, article_cache, markup_cache
+from services.prefix_index import PrefixIndex
+from services.stats import ArticleStats
+from services.sync_io import SyncBot, SyncDatabase, run_sync
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    def message_handler(self, **kwargs):
+        return lambda handler: handler
+
+    callback_query_handler = inline_handler = message_handler
+
+    def reply_to(self, message, text, **kwargs):
+        self.sent.append((text, kwargs.get("reply_markup")))
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((text, kwargs.get("reply_markup")))
+
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        self.sent.append(("answer", text))
+
+
+class AsyncRecordingBot(RecordingBot):
+    async def reply_to(self, message, text, **kwargs):
+        super().reply_to(message, text, **kwargs)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        super().send_message(chat_id, text, **kwargs)
+
+
+def message(text, uid=1):
+    return types.Message.de_json({
+        "message_id": 1, "date": 0, "text": text,
+        "chat": {"id": uid, "type": "private"},
+        "from": {"id": uid, "is_bot": False, "first_name": "test"}
+    })
+
+
+def callback(data, uid=1):
+    return types.CallbackQuery.de_json({
+        "id": "1", "chat_instance": "test", "data": data,
+        "from": {"id": uid, "is_bot": False, "first_name": "test"},
+        "message": {"message_id": 5, "date": 0, "chat": {"id": uid, "type": "private"}, "text": "test"}
+    })
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    for cache in (user_cache, article_cache, markup_cache):
+        cache.clear()
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_shared_handlers_run_in_both_modes(memory_db, mode):
+    # The same coroutines back DispatchingTeleBot through SyncBot and FilteringAsyncTeleBot on an event loop
+    if mode == "sync":
+        bot, run = SyncBot(RecordingBot()), run_sync
+    else:
+        bot, run = AsyncRecordingBot(), asyncio.run
+    recorded = bot.bot if mode == "sync" else bot
+    db = SyncDatabase(memory_db)
+    base = BaseCommands(bot, db)
+    articles = ArticleCommands(bot, db, PrefixIndex(memory_db), ArticleStats(memory_db, 0, 0, 0), text_index=False)
+
+    run(base.start_command(message("/start")))
+    memory_db.users.update_one({"uid": 1}, {"$set": {"moderator": True}})
+    user_cache.clear()
+    run(articles.create_command(message("/create Python a language")))
+    run(articles.save_command(message("/save Python")))
+    run(articles.list_command(message("/list")))
+
+    keyboard = json.loads(recorded.sent[-1][1])["inline_keyboard"]
+    assert [row[0]["text"] for row in keyboard] == ["Python"]
+    assert articles.prefix_index.search("py", 5) == [("Python", keyboard[0][0]["callback_data"][len("article_"):])]
+
+    run(articles.article_callback_handler(callback(keyboard[0][0]["callback_data"])))
+    assert recorded.sent[-1][0].startswith("*Python*\n\na language")
+
+
+def test_article_rows_are_serialized_once_per_page():
+    articles = [{"_id": f"id{index}", "name": f"article{index}"} for index in range(3)]
+
+    first = json.loads(ArticleCommands._build_articles_markup(articles, "saved", 0, True))
+    cached = markup_cache.get(("id0", "id1", "id2"))
+    second = json.loads(ArticleCommands._build_articles_markup(articles, "page_abc", 10, False))
+
+    assert isinstance(cached, str)
+    assert first["inline_keyboard"][:3] == second["inline_keyboard"][:3]
+    assert first["inline_keyboard"][3:] == [[{"text": ">", "callback_data": "saved_10"}]]
+    assert second["inline_keyboard"][3:] == [[{"text": "<", "callback_data": "page_abc_0"}]]
+    assert markup_cache.stats()["hits"] == 2
+
+
+def test_random_articles_fit_one_page_without_a_result_set(memory_db):
+    memory_db.articles.insert_many([{"name": f"article{index}"} for index in range(30)])
+    memory_db.users.insert_one({"uid": 1, "moderator": False, "language": "en", "saved_articles": []})
+    bot = RecordingBot()
+    articles = ArticleCommands(
+        SyncBot(bot), SyncDatabase(memory_db), PrefixIndex(memory_db), ArticleStats(memory_db, 0, 0, 0)
+    )
+
+    run_sync(articles.random_command(message("/random")))
+
+    keyboard = json.loads(bot.sent[-1][1])["inline_keyboard"]
+    data = [row[0]["callback_data"] for row in keyboard]
+    assert len(data) == 10 and len(set(data)) == 10
+    assert all(value.startswith("article_") for value in data)
+    assert memory_db.result_sets.count_documents({}) == 0
+
+
+def test_cursor_parsing_rejects_tampered_data():
+    parse = ArticleCommands._parse_cursor
+    article_id = "0123456789abcdef01234567"
+
+    assert [str(value) for value in parse(f"article_{article_id}", ObjectId)] == [article_id]
+    assert parse(f"history_{article_id}_20", ObjectId, int) == [ObjectId(article_id), 20]
+    assert parse("article_zz", ObjectId) is None
+    assert parse(f"page_{article_id}", ObjectId, int) is None
+    assert parse(f"page_{article_id}_x", ObjectId, int) is None
+    assert parse(f"revision_{article_id}_1_2", ObjectId, int) is None
+    offsets = [ArticleCommands._get_saved_offset(data) for data in ("saved_20", "saved_next_2", "saved_-10", "saved_up")]
+    assert offsets == [20, 20, None, None]
+
+
+@pytest.mark.parametrize("data", ["article_zz", "page_zz_10", "page_0123456789abcdef01234567_-10", "history_zz_0",
+                                  "revision_0123456789abcdef01234567_x", "revision_zz"])
+def test_bad_callback_data_is_answered_quietly(memory_db, data):
+    memory_db.users.insert_one({"uid": 1, "moderator": False, "language": "en", "saved_articles": []})
+    bot = RecordingBot()
+    articles = ArticleCommands(
+        SyncBot(bot), SyncDatabase(memory_db), PrefixIndex(memory_db), ArticleStats(memory_db, 0, 0, 0)
+    )
+    handler = {
+        "article": articles.article_callback_handler,
+        "page": articles.result_set_callback_handler,
+        "history": articles.history_callback_handler,
+        "revision": articles.revision_callback_handler
+    }[data.split("_")[0]]
+
+    run_sync(handler(callback(data)))
+
+    assert bot.sent == [("answer", None)]
@@ -0,0 +1,19 @@
+from services.cache import LRUCache
+from services.metrics import MetricsRegistry, register_cache_metrics
+
+
+def test_cache_hits_and_misses_are_counters():
+    registry = MetricsRegistry()
+    cache = LRUCache(10, 60)
+    register_cache_metrics(registry, {"users": cache})
+    cache.set(1, "user")
+    cache.get(1)
+    cache.get(2)
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE rewiki_cache_hits_total counter" in lines
+    assert 'rewiki_cache_hits_total{cache="users"} 1' in lines
+    assert "# TYPE rewiki_cache_misses_total counter" in lines
+    assert 'rewiki_cache_misses_total{cache="users"} 1' in lines
+    assert 'rewiki_cache_size{cache="users"} 1' in lines
@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import deque
+
+from telebot.apihelper import ApiTelegramException
+
+from services.outbox import Outbox, OutboxJob
+
+
+def telegram_error(code, description, retry_after=None):
+    result_json = {"ok": False, "error_code": code, "description": description}
+    if retry_after is not None:
+        result_json["parameters"] = {"retry_after": retry_after}
+    return ApiTelegramException("sendMessage", None, result_json)
+
+
+def scripted(*outcomes):
+    calls = []
+    outcomes = list(outcomes)
+
+    def send_message(*args, **kwargs):
+        calls.append((args, kwargs))
+        outcome = outcomes.pop(0) if outcomes else None
+        if outcome:
+            raise outcome
+
+    return send_message, calls
+
+
+def make_outbox(chat_rate=100, chat_burst=100, max_retries=3):
+    return Outbox(1, 1000, chat_rate, chat_burst, max_retries)
+
+
+def test_retry_after_from_telegram_schedules_the_retry(clock):
+    send_message, calls = scripted(telegram_error(429, "Too Many Requests", retry_after=7))
+    chat_jobs = deque([OutboxJob(send_message, (1, "hi"), {})])
+    outbox = make_outbox()
+
+    assert outbox._run_head(1, chat_jobs) == 7
+    assert len(chat_jobs) == 1
+
+    assert outbox._run_head(1, chat_jobs) == 0
+    assert not chat_jobs
+    assert len(calls) == 2
+
+
+def test_server_errors_back_off_then_give_up(clock):
+    send_message, calls = scripted(*[telegram_error(502, "Bad Gateway")] * 5)
+    chat_jobs = deque([OutboxJob(send_message, (1, "hi"), {})])
+    outbox = make_outbox(max_retries=2)
+
+    assert [outbox._run_head(1, chat_jobs) for _ in range(3)] == [1, 2, 0]
+    assert not chat_jobs
+    assert len(calls) == 3
+
+
+def test_client_errors_are_dropped_without_retrying(clock):
+    send_message, calls = scripted(telegram_error(400, "Bad Request: chat not found"))
+    chat_jobs = deque([OutboxJob(send_message, (1, "hi"), {})])
+
+    assert make_outbox()._run_head(1, chat_jobs) == 0
+    assert not chat_jobs
+    assert len(calls) == 1
+
+
+def test_chat_over_its_rate_waits_without_sending(clock):
+    send_message, calls = scripted()
+    chat_jobs = deque([OutboxJob(send_message, (1, "first"), {}), OutboxJob(send_message, (1, "second"), {})])
+    outbox = make_outbox(chat_rate=1, chat_burst=1)
+
+    assert outbox._run_head(1, chat_jobs) == 0
+    assert outbox._run_head(1, chat_jobs) == 1
+    assert len(calls) == 1
+
+    clock.advance(1)
+    assert outbox._run_head(1, chat_jobs) == 0
+    assert [args[1] for args, _ in calls] == ["first", "second"]
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id, text, **kwargs):
+        with self.lock:
+            self.sent.append((chat_id, text))
+
+    def edit_message_reply_markup(self, chat_id=None, message_id=None, reply_markup=None):
+        with self.lock:
+            self.sent.append((chat_id, message_id, reply_markup))
+
+
+def test_pending_edits_of_a_message_are_coalesced(clock):
+    bot = FakeBot()
+    outbox = make_outbox()
+    outbox.install(bot)
+
+    bot.edit_message_reply_markup(chat_id=1, message_id=5, reply_markup="old")
+    bot.edit_message_reply_markup(chat_id=1, message_id=5, reply_markup="new")
+    jobs = outbox._queues[0]
+    assert jobs.qsize() == 1
+
+    _, job = jobs.get_nowait()
+    assert outbox._run_head(1, deque([job])) == 0
+    assert bot.sent == [(1, 5, "new")]
+
+
+def test_a_limited_chat_does_not_hold_up_the_others():
+    bot = FakeBot()
+    outbox = make_outbox(chat_rate=20, chat_burst=1)
+    outbox.install(bot)
+    bot.send_message(1, "first")
+    bot.send_message(1, "second")
+    bot.send_message(2, "other chat")
+    jobs = outbox._queues[0]
+    worker = threading.Thread(target=outbox._work, args=(jobs,), daemon=True)
+    worker.start()
+
+    deadline = time.monotonic() + 5
+    while len(bot.sent) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    jobs.put(None)
+    worker.join(5)
+
+    assert bot.sent == [(1, "first"), (2, "other chat"), (1, "second")]
+
+
+def test_senders_keep_a_chat_on_one_queue():
+    outbox = Outbox(4, 1000, 100, 100, 3)
+    for index in range(3):
+        outbox.send_message(42, f"message {index}")
+
+    sizes = [jobs.qsize() for jobs in outbox._queues]
+    assert sorted(sizes) == [0, 0, 0, 3]
@@ -0,0 +1,23 @@
+from services.pagination import ResultSetStore
+from services.sync_io import SyncDatabase, run_sync
+
+
+def test_result_set_pages(memory_db):
+    store = ResultSetStore(SyncDatabase(memory_db), ttl=60)
+    articles = [{"_id": index, "name": f"article{index}"} for index in range(25)]
+    result_set_id = run_sync(store.create(articles))
+
+    first, has_next = run_sync(store.get_page(result_set_id, 0, 10))
+    assert [article["name"] for article in first] == [f"article{index}" for index in range(10)]
+    assert has_next
+
+    last, has_next = run_sync(store.get_page(result_set_id, 20, 10))
+    assert [article["_id"] for article in last] == list(range(20, 25))
+    assert not has_next
+
+
+def test_missing_or_malformed_result_sets(memory_db):
+    store = ResultSetStore(SyncDatabase(memory_db), ttl=60)
+
+    assert run_sync(store.get_page("0123456789abcdef01234567", 0, 10)) == (None, False)
+    assert run_sync(store.get_page("not-an-id", 0, 10)) == (None, False)
@@ -0,0 +1,41 @@
+import pytest
+
+from services.prefix_index import PrefixIndex
+
+
+def test_search_is_case_insensitive_and_ordered(memory_db):
+    memory_db.articles.insert_many([{"name": name} for name in ("python", "Pyramid", "pytest", "Rust", "py")])
+    index = PrefixIndex(memory_db)
+
+    assert [name for name, _ in index.search("PY", 10)] == ["py", "Pyramid", "pytest", "python"]
+    assert [name for name, _ in index.search("py", 2)] == ["py", "Pyramid"]
+    assert index.search("go", 10) == []
+
+
+def test_handler_writes_update_the_index_and_broadcast(memory_db):
+    index = PrefixIndex(memory_db)
+    index.build()
+    broadcast = []
+    index.on_invalidate = broadcast.append
+
+    index.add("python", "id1")
+    index.add("python", "id2")
+    assert index.search("py", 10) == [("python", "id2")]
+
+    index.remove("python")
+    assert index.search("py", 10) == []
+    assert broadcast == [["python"], ["python"], ["python"]]
+
+
+def test_invalidate_rereads_a_name_without_broadcasting(memory_db):
+    index = PrefixIndex(memory_db)
+    index.build()
+    index.on_invalidate = lambda keys: pytest.fail("remote invalidations must not be broadcast again")
+    article_id = memory_db.articles.insert_one({"name": "python"}).inserted_id
+
+    index.invalidate("python", broadcast=False)
+    assert index.search("p", 10) == [("python", str(article_id))]
+
+    memory_db.articles.delete_one({"_id": article_id})
+    index.invalidate("python", broadcast=False)
+    assert index.search("p", 10) == []
@@ -0,0 +1,66 @@
+import random
+
+from services import revisions
+from services.revisions import RevisionStore
+from services.sync_io import SyncDatabase, run_sync
+
+
+def test_delta_rebuilds_previous_content():
+    delta, added, removed = RevisionStore._diff("hello brave new world", "hello old world")
+
+    assert RevisionStore._apply("hello brave new world", delta) == "hello old world"
+    assert (added, removed) == (9, 3)
+
+
+def test_delta_round_trips_random_edits():
+    rng = random.Random(0)
+    for _ in range(300):
+        previous = "".join(rng.choice("ab cd\n") for _ in range(rng.randint(0, 80)))
+        content = "".join(rng.choice("ab ce\n") for _ in range(rng.randint(0, 80)))
+
+        delta, _, _ = RevisionStore._diff(content, previous)
+
+        assert RevisionStore._apply(content, delta) == previous
+
+
+def test_get_content_walks_back_through_revisions(memory_db):
+    store = RevisionStore(SyncDatabase(memory_db))
+    versions = ["first", "first and second", "second", "third version"]
+    article_id = memory_db.articles.insert_one({"name": "A", "content": versions[-1], "revision": 3}).inserted_id
+    for number in range(1, len(versions)):
+        run_sync(store.record(article_id, number, versions[number - 1], versions[number], 1, "2026-01-01"))
+
+    article = memory_db.articles.find_one({"_id": article_id})
+
+    assert [run_sync(store.get_content(article, number)) for number in (1, 2, 3)] == versions[:3]
+    assert run_sync(store.get_content(article, 4)) is None
+
+
+def test_get_content_starts_from_the_nearest_snapshot(memory_db, monkeypatch):
+    monkeypatch.setattr(revisions, "SNAPSHOT_INTERVAL", 4)
+    store = RevisionStore(SyncDatabase(memory_db))
+    versions = [f"version {number} " * number for number in range(11)]
+    article_id = memory_db.articles.insert_one({"name": "A", "content": versions[-1], "revision": 10}).inserted_id
+    for number in range(1, len(versions)):
+        run_sync(store.record(article_id, number, versions[number - 1], versions[number], 1, "2026-01-01"))
+
+    snapshots = [revision["number"] for revision in memory_db.article_revisions.find({"snapshot": {"$exists": True}})]
+    assert snapshots == [4, 8]
+
+    # Applying the current content's deltas to a snapshot would garble it, so this proves where the walk starts
+    memory_db.articles.update_one({"_id": article_id}, {"$set": {"content": "not the real content"}})
+    article = memory_db.articles.find_one({"_id": article_id})
+    assert [run_sync(store.get_content(article, number)) for number in range(1, 9)] == versions[:8]
+
+
+def test_get_content_walks_legacy_revisions_without_snapshots(memory_db, monkeypatch):
+    monkeypatch.setattr(revisions, "SNAPSHOT_INTERVAL", 2)
+    store = RevisionStore(SyncDatabase(memory_db))
+    versions = ["one", "one two", "two three", "three"]
+    article_id = memory_db.articles.insert_one({"name": "A", "content": versions[-1], "revision": 3}).inserted_id
+    for number in range(1, len(versions)):
+        run_sync(store.record(article_id, number, versions[number - 1], versions[number], 1, "2026-01-01"))
+    memory_db.article_revisions.update_many({}, {"$unset": {"snapshot": ""}})
+
+    article = memory_db.articles.find_one({"_id": article_id})
+    assert [run_sync(store.get_content(article, number)) for number in (1, 2, 3)] == versions[:3]
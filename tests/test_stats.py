@@ -0,0 +1,50 @@
+from pymongo.errors import AutoReconnect
+
+from services.stats import ArticleStats
+
+
+def test_flush_adds_pending_counts_in_one_write(memory_db):
+    first, second = memory_db.articles.insert_many([{"name": "a"}, {"name": "b"}]).inserted_ids
+    stats = ArticleStats(memory_db, 10, 10, 300)
+    for _ in range(3):
+        stats.record_view(first)
+    stats.record_view(second)
+    stats.record_save(second)
+
+    stats.flush()
+    stats.flush()
+
+    assert memory_db.articles.find_one({"_id": first})["views"] == 3
+    article = memory_db.articles.find_one({"_id": second})
+    assert (article["views"], article["saves"]) == (1, 1)
+
+
+def test_failed_flush_keeps_the_counts_for_the_next_one(memory_db, monkeypatch):
+    article_id = memory_db.articles.insert_one({"name": "a"}).inserted_id
+    stats = ArticleStats(memory_db, 10, 10, 300)
+    stats.record_view(article_id)
+
+    def fail(*args, **kwargs):
+        raise AutoReconnect("down")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(type(memory_db.articles), "bulk_write", fail)
+        stats.flush()
+    stats.record_view(article_id)
+    stats.flush()
+
+    assert memory_db.articles.find_one({"_id": article_id})["views"] == 2
+
+
+def test_leaderboard_lists_read_articles_by_views_then_saves(memory_db):
+    memory_db.articles.insert_many([
+        {"name": "unread", "views": 0, "saves": 9},
+        {"name": "second", "views": 5, "saves": 1},
+        {"name": "first", "views": 5, "saves": 2},
+        {"name": "third", "views": 1, "saves": 0}
+    ])
+    stats = ArticleStats(memory_db, 10, 2, 300)
+
+    stats.refresh_leaderboard()
+
+    assert [article["name"] for article in stats.leaderboard] == ["first", "second"]
@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+from services.throttle import UpdateFilter
+
+
+def make_message(update_id, uid=1):
+    return SimpleNamespace(
+        update_id=update_id, message=SimpleNamespace(from_user=SimpleNamespace(id=uid)),
+        callback_query=None, inline_query=None
+    )
+
+
+def make_callback(update_id, data, uid=1, message_id=10):
+    call = SimpleNamespace(
+        id=str(update_id), data=data, inline_message_id=None,
+        from_user=SimpleNamespace(id=uid, language_code="en"),
+        message=SimpleNamespace(chat=SimpleNamespace(id=uid), message_id=message_id)
+    )
+    return SimpleNamespace(update_id=update_id, message=None, callback_query=call, inline_query=None)
+
+
+def make_inline_query(update_id, uid=1):
+    return SimpleNamespace(
+        update_id=update_id, message=None, callback_query=None,
+        inline_query=SimpleNamespace(from_user=SimpleNamespace(id=uid))
+    )
+
+
+def test_duplicate_update_ids_are_dropped(clock):
+    update_filter = UpdateFilter(rate=10, burst=10, window=2, max_users=100)
+
+    assert update_filter.check(make_message(1)) is None
+    assert update_filter.check(make_message(1)) == "duplicate"
+
+    clock.advance(3)
+    assert update_filter.check(make_message(1)) is None
+
+
+def test_identical_callbacks_within_window_are_dropped(clock):
+    update_filter = UpdateFilter(rate=10, burst=10, window=2, max_users=100)
+
+    assert update_filter.check(make_callback(1, "saved_10")) is None
+    assert update_filter.check(make_callback(2, "saved_10")) == "duplicate"
+    assert update_filter.check(make_callback(3, "saved_20")) is None
+    assert update_filter.check(make_callback(4, "saved_10", message_id=11)) is None
+
+    clock.advance(3)
+    assert update_filter.check(make_callback(5, "saved_10")) is None
+
+
+def test_users_are_throttled_separately(clock):
+    update_filter = UpdateFilter(rate=1, burst=2, window=2, max_users=100)
+
+    assert [update_filter.check(make_message(i, uid=1)) for i in range(3)] == [None, None, "throttled"]
+    assert update_filter.check(make_message(10, uid=2)) is None
+
+    clock.advance(1)
+    assert update_filter.check(make_message(3, uid=1)) is None
+
+
+def test_inline_queries_are_not_throttled(clock):
+    update_filter = UpdateFilter(rate=1, burst=1, window=2, max_users=100)
+
+    assert all(update_filter.check(make_inline_query(i)) is None for i in range(5))
+
+
+def test_dropped_callbacks_are_answered():
+    answered = []
+    bot = SimpleNamespace(answer_callback_query=lambda call_id, text=None: answered.append((call_id, text)))
+    update_filter = UpdateFilter(rate=1, burst=1, window=2, max_users=100)
+
+    update_filter.answer_dropped(bot, make_callback(1, "saved_10").callback_query, "duplicate")
+
+    assert answered == [("1", None)]
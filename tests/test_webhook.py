@@ -0,0 +1,59 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from services.webhook import SECRET_HEADER, WebhookServer
+
+
+class RecordingBot:
+    def __init__(self):
+        self.updates = []
+        self.received = threading.Event()
+
+    def process_new_updates(self, updates):
+        self.updates.extend(updates)
+        self.received.set()
+
+
+@pytest.fixture
+def webhook():
+    bot = RecordingBot()
+    server = WebhookServer(bot, "127.0.0.1", 0, "/webhook", secret_token="secret")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, bot
+    server.shutdown()
+
+
+def post(server, payload, secret="secret"):
+    host, port = server._server.server_address[:2]
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    request = urllib.request.Request(
+        f"http://{host}:{port}/webhook", data=body, headers={SECRET_HEADER: secret.encode().decode("latin-1")}
+    )
+    try:
+        return urllib.request.urlopen(request).status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_malformed_update_rejects_only_its_request(webhook):
+    server, bot = webhook
+
+    assert post(server, [{"update_id": 1}, {"foo": 1}, {"update_id": 3}, 5]) == 400
+    assert post(server, 5) == 400
+    assert post(server, {"update_id": 2, "message": 5}) == 400
+    assert post(server, b"\xff") == 400
+    assert post(server, [{"update_id": 4}, {"update_id": 5}]) == 200
+
+    assert bot.received.wait(1)
+    assert [update.update_id for update in bot.updates] == [4, 5]
+
+
+def test_wrong_or_non_ascii_secret_is_forbidden(webhook):
+    server, bot = webhook
+
+    assert post(server, {"update_id": 1}, secret="wrong") == 403
+    assert post(server, {"update_id": 1}, secret="sëcret") == 403